@@ -0,0 +1,141 @@
+import asyncio
+import traceback
+from anyio import to_thread
+from pymongo.errors import BulkWriteError
+
+# --- Buffer de escrita (group commit) ---
+# Em vez de um insert_one por pedido, os documentos são acumulados e gravados com
+# insert_many quando o lote chega a "max_documentos" ou passam "intervalo_ms" desde
+# o primeiro documento do lote. Cada pedido espera pelo seu futuro, que só é resolvido
+# depois de o lote estar gravado: a resposta continua a confirmar a escrita.
+# O buffer vive no event loop de cada worker (iniciado/parado no lifespan do main.py).
+
+
+class BufferCheio(Exception):
+    pass
+
+
+class BufferEscrita:
+    def __init__(self, colecao, max_documentos: int, intervalo_ms: int, capacidade: int, ao_inserir=None):
+        self.colecao = colecao
+        self.max_documentos = max_documentos
+        self.intervalo = intervalo_ms / 1000
+        self.capacidade = capacidade
+        # Chamada (numa thread) com os documentos gravados de cada lote, já com _id.
+        self.ao_inserir = ao_inserir
+
+        self._fila = None
+        self._tarefa = None
+        self._gravacao = None
+        self._resto = []
+        self.lotes = 0
+        self.documentos = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self._tarefa is not None
+
+    def iniciar(self):
+        self._fila = asyncio.Queue(maxsize=self.capacidade)
+        self._tarefa = asyncio.create_task(self._ciclo())
+        print(f"🧺 Buffer de escrita ativo ({self.max_documentos} docs / {self.intervalo * 1000:g} ms)")
+
+    # Coloca o documento no lote seguinte e espera que seja gravado. Devolve o documento com _id.
+    async def inserir(self, documento: dict) -> dict:
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self._fila.put_nowait((documento, futuro))
+        except asyncio.QueueFull:
+            raise BufferCheio()
+        return await futuro
+
+    async def _ciclo(self):
+        loop = asyncio.get_running_loop()
+        lote = []
+        try:
+            while True:
+                lote = [await self._fila.get()]
+                limite = loop.time() + self.intervalo
+
+                while len(lote) < self.max_documentos:
+                    espera = limite - loop.time()
+                    if espera <= 0:
+                        break
+                    try:
+                        lote.append(await asyncio.wait_for(self._fila.get(), timeout=espera))
+                    except asyncio.TimeoutError:
+                        break
+
+                # A gravação em curso nunca é interrompida pelo shutdown (ver parar()).
+                self._gravacao = asyncio.ensure_future(self._gravar(lote))
+                lote = []
+                await asyncio.shield(self._gravacao)
+        except asyncio.CancelledError:
+            self._resto = lote
+            raise
+
+    async def _gravar(self, lote: list):
+        documentos = [doc for doc, _ in lote]
+        falhas = {}
+
+        try:
+            gravados = await to_thread.run_sync(self._inserir_lote, documentos, falhas)
+        except Exception as e:
+            traceback.print_exc()
+            for _, futuro in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        self.lotes += 1
+        self.documentos += len(gravados)
+
+        for i, (doc, futuro) in enumerate(lote):
+            if futuro.done():
+                continue
+            if i in falhas:
+                futuro.set_exception(falhas[i])
+            else:
+                futuro.set_result(doc)
+
+    # Corre numa thread: insert_many não ordenado; erros de documentos individuais
+    # (ex.: chave duplicada) só fazem falhar os pedidos correspondentes.
+    def _inserir_lote(self, documentos: list, falhas: dict) -> list:
+        try:
+            self.colecao.insert_many(documentos, ordered=False)
+        except BulkWriteError as e:
+            for erro in e.details.get("writeErrors", []):
+                falhas[erro["index"]] = RuntimeError(erro.get("errmsg", "Falha ao gravar a tarefa."))
+
+        gravados = [doc for i, doc in enumerate(documentos) if i not in falhas]
+
+        if self.ao_inserir and gravados:
+            try:
+                self.ao_inserir(gravados)
+            except Exception:
+                traceback.print_exc()
+
+        return gravados
+
+    # Grava o que ainda estiver na fila e termina (chamado no shutdown).
+    async def parar(self):
+        if self._tarefa is None:
+            return
+
+        self._tarefa.cancel()
+        await asyncio.gather(self._tarefa, return_exceptions=True)
+        self._tarefa = None
+
+        if self._gravacao is not None:
+            await self._gravacao
+
+        pendentes = self._resto
+        while not self._fila.empty():
+            pendentes.append(self._fila.get_nowait())
+
+        for i in range(0, len(pendentes), self.max_documentos):
+            await self._gravar(pendentes[i:i + self.max_documentos])
+
+        self._resto = []
+        if pendentes:
+            print(f"🧺 Buffer de escrita: {len(pendentes)} tarefa(s) gravada(s) no shutdown")
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import OrderedDict
+from pymongo import UpdateOne
+from db import db
+
+# --- Caches em memória ---
+# Cada worker tem a sua cópia. Para que uma escrita feita noutro worker também
+# invalide a cache, as entradas podem ficar associadas a uma "versão" guardada
+# no Mongo (coleção cache_versions), incrementada pelos endpoints de escrita.
+# Ler a versão é um find_one por _id, muito mais barato do que refazer a agregação.
+versions_collection = db["cache_versions"]
+
+_AUSENTE = object()
+
+
+class CacheLocal:
+    def __init__(self, ttl: float = None, max_entradas: int = 1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Devolve (versao, valor) ou None se não existir ou tiver expirado.
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return None
+
+            expira, versao, valor = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._dados[chave]
+                return None
+
+            self._dados.move_to_end(chave)
+            return versao, valor
+
+    def guardar(self, chave, valor, versao=None):
+        expira = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._dados[chave] = (expira, versao, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def invalidar(self, chave=_AUSENTE):
+        with self._lock:
+            if chave is _AUSENTE:
+                self._dados.clear()
+            else:
+                self._dados.pop(chave, None)
+
+    # Devolve o valor em cache se a versão coincidir; caso contrário calcula e guarda.
+    def obter_ou_calcular(self, chave, calcular, versao=None):
+        entrada = self.obter(chave)
+        if entrada is not None and entrada[0] == versao:
+            return entrada[1]
+
+        valor = calcular()
+        self.guardar(chave, valor, versao)
+        return valor
+
+
+# --- Versões partilhadas entre workers ---
+
+def versao(chave: str) -> int:
+    doc = versions_collection.find_one({"_id": chave}, {"v": 1})
+    return doc["v"] if doc else 0
+
+
+def incrementar_versoes(chaves):
+    chaves = {c for c in chaves if c}
+    if not chaves:
+        return
+
+    versions_collection.bulk_write(
+        [UpdateOne({"_id": c}, {"$inc": {"v": 1}}, upsert=True) for c in chaves],
+        ordered=False,
+    )
+
+
+# --- Coalescência de pedidos iguais (single-flight) ---
+# Pedidos idênticos que chegam enquanto o primeiro ainda está a ser calculado
+# esperam por esse cálculo em vez de repetirem a consulta. Opcionalmente o
+# resultado fica em cache durante "ttl" segundos. Por worker, como a CacheLocal:
+# invalidar() só afeta o worker onde é chamado; os outros mantêm os seus resultados
+# até expirarem (por isso o ttl deve ser curto com vários workers).
+class _EmCurso:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+class Coalescedor:
+    def __init__(self, ttl: float = None, max_entradas: int = 256):
+        self.cache = CacheLocal(ttl, max_entradas) if ttl else None
+        self._em_curso = {}
+        self._lock = threading.Lock()
+        # Incrementada por invalidar(): cálculos iniciados antes não guardam o resultado.
+        self._geracao = 0
+
+    def executar(self, chave, calcular):
+        if self.cache is not None:
+            entrada = self.cache.obter(chave)
+            if entrada is not None:
+                return entrada[1]
+
+        with self._lock:
+            voo = self._em_curso.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_curso[chave] = _EmCurso()
+                geracao = self._geracao
+
+        if not lider:
+            voo.evento.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.valor
+
+        try:
+            voo.valor = calcular()
+            with self._lock:
+                if self.cache is not None and geracao == self._geracao:
+                    self.cache.guardar(chave, voo.valor)
+            return voo.valor
+        except Exception as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                if self._em_curso.get(chave) is voo:
+                    del self._em_curso[chave]
+            voo.evento.set()
+
+    # Descarta os resultados em cache deste worker. Os cálculos já em curso terminam para
+    # quem está à espera deles, mas não ficam em cache e os pedidos seguintes não se juntam a eles.
+    def invalidar(self):
+        with self._lock:
+            self._geracao += 1
+            self._em_curso.clear()
+            if self.cache is not None:
+                self.cache.invalidar()
+
+
+# Chave de um pedido: rota + parâmetros da query (ordenados) + papel do utilizador.
+def chave_pedido(request, papel: str = "") -> str:
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}|{papel}"
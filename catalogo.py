@@ -0,0 +1,233 @@
+import difflib
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from db import db
+from cache import versao, incrementar_versoes
+
+# --- Catálogos em memória (clientes, contratos, parceiros, produtos, atividades) ---
+# Cada worker guarda um índice de prefixos por catálogo, para que o autocomplete
+# (GET /autocomplete/{kind}) responda sem ir ao Mongo. As escritas nos catálogos
+# chamam invalidar(): o índice local é descartado de imediato e a versão partilhada
+# (cache_versions, chave "catalogo:<kind>") é incrementada para os outros workers,
+# que a verificam no máximo a cada VERIFICACAO segundos.
+# Os mesmos catálogos validam as referências das tarefas (validar / validar_lote).
+
+# kind → (coleção, campo com o nome, campos extra devolvidos nas sugestões)
+CATALOGOS = {
+    "clients": ("clients", "nome", ()),
+    "contracts": ("contracts", "contrato", ("cliente",)),
+    "partners": ("partners", "parceiro", ()),
+    "products": ("products", "produto", ()),
+    "activities": ("activities", "atividade", ()),
+}
+
+VERIFICACAO = 5
+
+
+# Forma usada nas comparações: sem acentos, sem distinção de maiúsculas e com espaços normalizados.
+def normalizar(texto) -> str:
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acentos.casefold().split())
+
+
+class Catalogo:
+    def __init__(self, documentos: list, campo: str, extras=()):
+        self.itens = []
+        for doc in documentos:
+            nome = doc.get(campo)
+            if not isinstance(nome, str) or not nome.strip():
+                continue
+            item = {"id": str(doc["_id"]), "nome": nome}
+            for extra in extras:
+                item[extra] = doc.get(extra)
+            self.itens.append(item)
+
+        # Dois arrays ordenados de (chave normalizada, posição em itens): o nome completo
+        # e o nome a partir de cada palavra seguinte ("lisboa" encontra "Câmara de Lisboa").
+        completas = []
+        palavras = []
+        for i, item in enumerate(self.itens):
+            chave = normalizar(item["nome"])
+            completas.append((chave, i))
+            partes = chave.split(" ")
+            for j in range(1, len(partes)):
+                palavras.append((" ".join(partes[j:]), i))
+
+        completas.sort()
+        palavras.sort()
+        self._completas = completas
+        self._palavras = palavras
+
+        # Nome normalizado → itens com esse nome (nos contratos o mesmo nome pode existir em vários clientes).
+        self._por_nome = {}
+        for chave, i in completas:
+            self._por_nome.setdefault(chave, []).append(self.itens[i])
+
+    def __len__(self):
+        return len(self.itens)
+
+    # Itens cujo nome coincide com "valor", ignorando acentos e maiúsculas.
+    def encontrar(self, valor: str) -> list:
+        return self._por_nome.get(normalizar(valor), [])
+
+    # Nomes mais parecidos com "valor" (para mensagens de erro).
+    def sugerir(self, valor: str, n: int = 3) -> list:
+        parecidos = difflib.get_close_matches(normalizar(valor), self._por_nome.keys(), n=n, cutoff=0.6)
+        if not parecidos:
+            return [item["nome"] for item in self.procurar(valor, n)]
+        return [self._por_nome[chave][0]["nome"] for chave in parecidos]
+
+    # Sugestões cujo nome (ou uma das suas palavras) começa por "prefixo".
+    # As que começam pelo nome completo vêm primeiro; dentro de cada grupo, por ordem alfabética.
+    def procurar(self, prefixo: str, limite: int = 10) -> list:
+        prefixo = normalizar(prefixo)
+        vistos = set()
+        resultado = []
+
+        for chaves in (self._completas, self._palavras):
+            pos = bisect_left(chaves, (prefixo,))
+            while pos < len(chaves) and len(resultado) < limite:
+                chave, i = chaves[pos]
+                if not chave.startswith(prefixo):
+                    break
+                if i not in vistos:
+                    vistos.add(i)
+                    resultado.append(self.itens[i])
+                pos += 1
+
+        return resultado
+
+
+_catalogos = {}
+_lock = threading.Lock()
+
+
+def _chave_versao(kind: str) -> str:
+    return f"catalogo:{kind}"
+
+
+def _construir(kind: str) -> Catalogo:
+    colecao, campo, extras = CATALOGOS[kind]
+    projecao = {campo: 1, **{e: 1 for e in extras}}
+    return Catalogo(list(db[colecao].find({}, projecao)), campo, extras)
+
+
+# Catálogo atual de "kind" (KeyError se não existir).
+# Com verificar=True a versão partilhada é sempre lida (usado antes de rejeitar um valor).
+def obter(kind: str, verificar: bool = False) -> Catalogo:
+    if kind not in CATALOGOS:
+        raise KeyError(kind)
+
+    agora = time.monotonic()
+    entrada = _catalogos.get(kind)
+    if entrada is not None and not verificar and agora - entrada[2] < VERIFICACAO:
+        return entrada[0]
+
+    atual = versao(_chave_versao(kind))
+    if entrada is not None and entrada[1] == atual:
+        _catalogos[kind] = (entrada[0], atual, agora)
+        return entrada[0]
+
+    with _lock:
+        entrada = _catalogos.get(kind)
+        if entrada is not None and entrada[1] == atual and entrada[2] >= agora:
+            return entrada[0]
+        catalogo = _construir(kind)
+        _catalogos[kind] = (catalogo, atual, time.monotonic())
+        return catalogo
+
+
+# Chamado após escritas num catálogo.
+def invalidar(kind: str):
+    try:
+        incrementar_versoes([_chave_versao(kind)])
+    except Exception as e:
+        print(f"⚠️ [catalogo] Falha ao invalidar {kind}:", e)
+    _catalogos.pop(kind, None)
+
+
+# --- Validação das referências das tarefas ---
+# Campo da tarefa → catálogo onde o valor tem de existir.
+CAMPOS_TAREFA = {
+    "cliente": "clients",
+    "contrato": "contracts",
+    "parceiro": "partners",
+    "produto": "products",
+    "atividade": "activities",
+}
+
+
+def _validar_linha(dados: dict, catalogos: dict) -> list:
+    erros = []
+
+    for campo, kind in CAMPOS_TAREFA.items():
+        valor = dados.get(campo)
+        # Campos vazios são permitidos, tal como catálogos ainda por preencher.
+        if not isinstance(valor, str) or not valor.strip() or not len(catalogos[kind]):
+            continue
+
+        itens = catalogos[kind].encontrar(valor)
+        if campo == "contrato" and itens and isinstance(dados.get("cliente"), str) and dados["cliente"].strip():
+            cliente = normalizar(dados["cliente"])
+            do_cliente = [item for item in itens if normalizar(item.get("cliente")) == cliente]
+            if not do_cliente:
+                erros.append({
+                    "campo": campo,
+                    "valor": valor,
+                    "erro": "O contrato não pertence ao cliente indicado.",
+                    "sugestoes": sorted({item["cliente"] for item in itens if item.get("cliente")}),
+                })
+                continue
+            itens = do_cliente
+
+        if not itens:
+            erros.append({
+                "campo": campo,
+                "valor": valor,
+                "erro": "Valor inexistente no catálogo.",
+                "sugestoes": catalogos[kind].sugerir(valor),
+            })
+            continue
+
+        # Guarda o nome tal como está no catálogo (acentos/maiúsculas diferentes são corrigidos).
+        dados[campo] = itens[0]["nome"]
+
+    return erros
+
+
+# Valida várias linhas numa só passagem: cada catálogo é obtido uma vez e, só se houver
+# erros, a versão partilhada é relida antes de os confirmar (escritas recentes noutros workers).
+# Corrige os nomes nas linhas recebidas e devolve {índice da linha: [erros]}.
+def validar_lote(linhas: list) -> dict:
+    catalogos = {kind: obter(kind) for kind in CAMPOS_TAREFA.values()}
+    erros = {}
+    for i, dados in enumerate(linhas):
+        erros_linha = _validar_linha(dados, catalogos)
+        if erros_linha:
+            erros[i] = erros_linha
+
+    if not erros:
+        return erros
+
+    suspeitos = {CAMPOS_TAREFA[e["campo"]] for erros_linha in erros.values() for e in erros_linha}
+    atualizados = {kind: obter(kind, verificar=True) for kind in suspeitos}
+    if all(atualizados[kind] is catalogos[kind] for kind in suspeitos):
+        return erros
+
+    catalogos.update(atualizados)
+    repetidos = {}
+    for i in erros:
+        erros_linha = _validar_linha(linhas[i], catalogos)
+        if erros_linha:
+            repetidos[i] = erros_linha
+    return repetidos
+
+
+# Valida (e corrige) uma tarefa. Devolve a lista de erros, vazia se for válida.
+def validar(dados: dict) -> list:
+    return validar_lote([dados]).get(0, [])
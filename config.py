@@ -22,3 +22,76 @@ API_KEY = os.getenv("API_KEY")
 ENTRA_CLIENT_ID = os.getenv("ENTRA_CLIENT_ID")
 ENTRA_CLIENT_SECRET = os.getenv("ENTRA_CLIENT_SECRET")
 ENTRA_TENANT_ID = os.getenv("ENTRA_TENANT_ID")
+
+
+# --- Perfil de produção (serve.py) ---
+
+def _env_int(nome: str, padrao=None):
+    valor = os.getenv(nome)
+    return int(valor) if valor not in (None, "") else padrao
+
+
+# CPUs efetivamente disponíveis para o processo.
+# Em contentores (Railway) os.cpu_count() devolve os cores do host;
+# por isso respeita primeiro a quota do cgroup e a afinidade do processo.
+def cpus_disponiveis() -> int:
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, periodo = f.read().split()
+        if quota != "max":
+            return max(1, -(-int(quota) // int(periodo)))
+    except (OSError, ValueError):
+        pass
+
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+
+    return os.cpu_count() or 1
+
+
+PORT = _env_int("PORT", 8080)
+
+# Número de workers uvicorn (processos). Por omissão um por CPU: na medição guardada em
+# tools/bench_workers_results.json (1 CPU) 2 e 3 workers renderam menos do que 1.
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", cpus_disponiveis())
+
+# Threads por worker para os endpoints síncronos (o Starlette usa 40 por omissão).
+THREADPOOL_SIZE = _env_int("THREADPOOL_SIZE", 40)
+
+# Pool de ligações do MongoClient (por worker: o total é WEB_CONCURRENCY x MONGO_MAX_POOL_SIZE).
+MONGO_MAX_POOL_SIZE = _env_int("MONGO_MAX_POOL_SIZE", 50)
+MONGO_MIN_POOL_SIZE = _env_int("MONGO_MIN_POOL_SIZE", 0)
+MONGO_MAX_IDLE_TIME_MS = _env_int("MONGO_MAX_IDLE_TIME_MS")
+MONGO_CONNECT_TIMEOUT_MS = _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)
+MONGO_SOCKET_TIMEOUT_MS = _env_int("MONGO_SOCKET_TIMEOUT_MS")
+
+# Compressão do protocolo, ex.: "zstd,snappy,zlib" (zstd/snappy precisam de pacotes extra).
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+
+# Agendador de tarefas periódicas dentro da API (1 = ativo, 0 = desligado).
+SCHEDULER_ENABLED = _env_int("SCHEDULER_ENABLED", 1)
+
+# Relatórios assíncronos (/reports): threads por worker, máximo de relatórios
+# à espera ou em curso por worker e tempo (s) durante o qual o resultado fica guardado.
+REPORT_WORKERS = _env_int("REPORT_WORKERS", 2)
+REPORT_MAX_PENDING = _env_int("REPORT_MAX_PENDING", 8)
+REPORT_TTL_SECONDS = _env_int("REPORT_TTL_SECONDS", 3600)
+
+# Pedidos pesados iguais e simultâneos partilham um só cálculo; com COALESCE_TTL > 0
+# o resultado também é reaproveitado durante esses segundos (0 = só enquanto está em curso).
+# As escritas só invalidam esse resultado no próprio worker; nos outros dura até expirar.
+COALESCE_TTL = _env_int("COALESCE_TTL", 0)
+
+# Barramento de eventos em tempo real (/events/stream) entre workers:
+# "local" (só o próprio worker) ou "mongo" (coleção capped partilhada).
+# Por omissão "mongo" com vários workers, para que cada cliente veja as escritas de todos.
+EVENT_BUS = (os.getenv("EVENT_BUS") or ("mongo" if WEB_CONCURRENCY > 1 else "local")).strip().lower()
+
+# Buffer de escrita para POST /tasks via x-api-key (1 = ativo): as tarefas são gravadas
+# em lotes de até TASK_BUFFER_MAX_DOCS ou a cada TASK_BUFFER_INTERVAL_MS; acima de
+# TASK_BUFFER_CAPACITY tarefas em espera o pedido recebe 503.
+TASK_WRITE_BUFFER = _env_int("TASK_WRITE_BUFFER", 0)
+TASK_BUFFER_MAX_DOCS = _env_int("TASK_BUFFER_MAX_DOCS", 100)
+TASK_BUFFER_INTERVAL_MS = _env_int("TASK_BUFFER_INTERVAL_MS", 20)
+TASK_BUFFER_CAPACITY = _env_int("TASK_BUFFER_CAPACITY", 2000)
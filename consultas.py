@@ -0,0 +1,50 @@
+from typing import Optional
+from db import tasks_collection
+from conversoes import parse_data
+
+# --- Consultas de administração sobre as tarefas ---
+# Usadas pelos endpoints GET /tasks/all e GET /tasks/atividade (routes/tasks.py)
+# e pelos relatórios assíncronos (relatorios.py).
+
+
+# Todas as tarefas, da mais recente para a mais antiga.
+# Com limite/salto devolve apenas essa página.
+def listar_todas_tarefas(limite: Optional[int] = None, salto: int = 0) -> list:
+    return list(iterar_todas_tarefas(limite, salto))
+
+
+# O mesmo, uma tarefa de cada vez, sem carregar a coleção inteira em memória (relatórios).
+def iterar_todas_tarefas(limite: Optional[int] = None, salto: int = 0):
+    for t in tasks_collection.find().sort([("data", -1), ("_id", -1)]).skip(salto).limit(limite or 0):
+        t["id"] = str(t.pop("_id"))
+        yield t
+
+
+# Tarefas de um mês (qualquer ano), ordenadas por utilizador e data.
+def atividade_mensal(mes: int) -> list:
+    projecao = {"_id": 0, "username": 1, "cliente": 1, "contrato": 1, "data": 1, "tempo_atividade": 1}
+    tarefas = tasks_collection.find({}, projecao)
+    resultados = []
+
+    # Avalia vários formatos de data suportados
+    for t in tarefas:
+        data_str = t.get("data")
+        if not data_str:
+            continue
+
+        data = parse_data(data_str)
+
+        if not data:
+            continue
+
+        if data.month == mes:
+            resultados.append({
+                "username": t.get("username"),
+                "cliente": t.get("cliente"),
+                "contrato": t.get("contrato"),
+                "data": data.strftime("%Y-%m-%d"),
+                "tempo_atividade": t.get("tempo_atividade")
+            })
+
+    resultados.sort(key=lambda x: (x["username"], x["data"]))
+    return resultados
@@ -0,0 +1,30 @@
+from fastapi import Query, Response
+from cache import CacheLocal
+
+# --- Totais das listagens (opt-in com ?count=exact|estimated) ---
+# O total vai no cabeçalho X-Total-Count, sem alterar o formato das respostas.
+#   estimated → metadados da coleção (estimated_document_count), sem percorrer documentos;
+#               só é possível sem filtro, caso contrário é usada a contagem exata
+#   exact     → count_documents com o mesmo filtro da listagem, em cache durante CONTAGEM_TTL
+CONTAGEM_TTL = 10
+
+contagens_cache = CacheLocal(ttl=CONTAGEM_TTL, max_entradas=1024)
+
+# Parâmetro ?count= partilhado pelas listagens.
+ModoContagem = Query(None, pattern="^(exact|estimated)$", description="Devolve o total em X-Total-Count")
+
+
+def contar(colecao, filtro: dict = None, modo: str = "exact") -> int:
+    filtro = filtro or {}
+
+    if modo == "estimated" and not filtro:
+        return colecao.estimated_document_count()
+
+    chave = (colecao.name, repr(sorted(filtro.items())))
+    return contagens_cache.obter_ou_calcular(chave, lambda: colecao.count_documents(filtro))
+
+
+# Define X-Total-Count na resposta quando o cliente pediu ?count=.
+def definir_total(response: Response, colecao, filtro: dict = None, modo: str = None):
+    if modo:
+        response.headers["X-Total-Count"] = str(contar(colecao, filtro, modo))
@@ -0,0 +1,45 @@
+from datetime import datetime
+from typing import Optional
+
+# --- Conversões dos campos livres das tarefas ---
+# Os schemas aceitam texto em vários formatos; estas funções normalizam os valores
+# para cálculos (rollups, relatórios) sem nunca lançar exceções.
+
+# O campo "data" chega em vários formatos; devolve None se nenhum for reconhecido.
+FORMATOS_DATA = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")
+
+
+def parse_data(data_str: str) -> Optional[datetime]:
+    for fmt in FORMATOS_DATA:
+        try:
+            return datetime.strptime(data_str, fmt)
+        except (TypeError, ValueError):
+            continue
+
+    return None
+
+
+# Data normalizada "AAAA-MM-DD" (ordenável e comparável como texto), ou None.
+# Guardada em data_iso nas tarefas para filtros por intervalo.
+def data_iso(data_str) -> Optional[str]:
+    data = parse_data(data_str)
+    return data.strftime("%Y-%m-%d") if data else None
+
+
+# Converte "HH:MM" em minutos; valores inválidos contam como 0.
+def minutos(tempo_str) -> int:
+    try:
+        h, m = map(int, tempo_str.split(":"))
+        return h * 60 + m
+    except Exception:
+        return 0
+
+
+# Converte números guardados como texto ("12", "12,5") ou número; inválidos contam como 0.
+def numero(valor) -> float:
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    try:
+        return float(str(valor).replace(",", "."))
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,148 @@
+import time
+from db import activities_collection, tasks_collection
+from cache import CacheLocal
+from conversoes import minutos, numero
+from pipelines import minutos_expr
+import jobs
+import rollup
+import sincronizacao
+
+# --- Custo das tarefas ---
+# valor_euro é derivado no servidor: horas faturadas x custo_hora da atividade.
+# A tabela de custos por atividade fica em cache em cada worker, para não custar
+# uma consulta por escrita; é invalidada localmente quando as atividades mudam
+# e expira ao fim de TAXAS_TTL segundos nos restantes workers.
+TAXAS_TTL = 30
+
+taxas_cache = CacheLocal(ttl=TAXAS_TTL, max_entradas=1)
+
+
+def _carregar_taxas() -> dict:
+    return {
+        a["atividade"]: numero(a.get("custo_hora"))
+        for a in activities_collection.find({}, {"atividade": 1, "custo_hora": 1})
+    }
+
+
+def taxas() -> dict:
+    return taxas_cache.obter_ou_calcular("taxas", _carregar_taxas)
+
+
+def invalidar_taxas():
+    taxas_cache.invalidar()
+
+
+def calcular_valor(task: dict, tabela: dict = None) -> float:
+    tabela = taxas() if tabela is None else tabela
+    custo_hora = tabela.get(task.get("atividade"), 0.0)
+    return round(minutos(task.get("tempo_faturado")) / 60 * custo_hora, 2)
+
+
+# Mesmo cálculo como expressão de agregação, para updates em pipeline que alteram só
+# um dos campos de que o valor depende (o outro é lido do documento no servidor).
+def valor_expr(tabela: dict = None) -> dict:
+    tabela = taxas() if tabela is None else tabela
+    if not tabela:
+        return {"$literal": 0.0}
+
+    custo_hora = {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": ["$atividade", {"$literal": atividade}]}, "then": custo}
+                for atividade, custo in tabela.items()
+            ],
+            "default": 0.0,
+        }
+    }
+    return {"$round": [{"$multiply": [{"$divide": [minutos_expr("$tempo_faturado"), 60]}, custo_hora]}, 2]}
+
+
+# --- Recalcular tarefas após mudança de custo_hora ---
+# Job retomável (ver jobs.py): percorre as tarefas da atividade por _id crescente,
+# em blocos, e reescreve valor_euro apenas onde mudou, com um bulk_write por bloco.
+# O rollup diário recebe as diferenças no mesmo passo, só das tarefas efetivamente
+# gravadas: as alteradas entre a leitura e a escrita (revisao diferente) são
+# recalculadas a partir do estado atual, até TENTATIVAS vezes.
+TAMANHO_BLOCO = 500
+TENTATIVAS = 3
+
+PROJECAO_TAREFA = {
+    "data": 1, "username": 1, "cliente": 1, "contrato": 1, "atividade": 1,
+    "tempo_atividade": 1, "tempo_faturado": 1, "tempo_viagem": 1,
+    "distancia_viagem": 1, "valor_euro": 1, "revisao": 1,
+}
+
+
+# Um só job por atividade: dois jobs sobre as mesmas tarefas aplicariam cada um as suas
+# diferenças ao rollup. Se já houver um ativo, é reiniciado (a nova taxa é lida em cada bloco).
+def recalcular_atividade(atividade: str) -> str:
+    exclusivo = f"recalcular_valor_atividade:{atividade}"
+    params = {
+        "atividade": atividade,
+        # Tarefas criadas noutros workers ainda podem usar a taxa antiga durante o TTL da cache:
+        # o job só termina depois disso, apanhando também essas tarefas.
+        "nao_terminar_antes": time.time() + TAXAS_TTL,
+    }
+
+    while True:
+        try:
+            return jobs.iniciar("recalcular_valor_atividade", params, exclusivo=exclusivo)
+        except jobs.JobEmCurso:
+            job_id = jobs.reiniciar(exclusivo, {"nao_terminar_antes": params["nao_terminar_antes"]})
+            if job_id is not None:
+                return job_id
+
+
+@jobs.handler("recalcular_valor_atividade")
+def _processar_bloco(job: dict):
+    atividade = job["params"]["atividade"]
+
+    filtro = {"atividade": atividade}
+    if job.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": job["ultimo_id"]}
+
+    tarefas = list(
+        tasks_collection.find(filtro, PROJECAO_TAREFA).sort("_id", 1).limit(TAMANHO_BLOCO)
+    )
+
+    if not tarefas:
+        espera = job["params"].get("nao_terminar_antes", 0) - time.time()
+        if espera > 0:
+            jobs.esperar(espera)
+            return {"ultimo_id": job.get("ultimo_id")}
+        return None
+
+    atividade_doc = activities_collection.find_one({"atividade": atividade}, {"custo_hora": 1})
+    tabela = {atividade: numero(atividade_doc.get("custo_hora")) if atividade_doc else 0.0}
+
+    alterados = 0
+    pendentes = tarefas
+    for _ in range(TENTATIVAS):
+        valores = {}
+        for t in pendentes:
+            if t.get("atividade") != atividade:
+                continue
+            valor = calcular_valor(t, tabela)
+            if numero(t.get("valor_euro")) != valor or not isinstance(t.get("valor_euro"), float):
+                valores[t["_id"]] = (t, valor)
+
+        if not valores:
+            break
+
+        gravadas, pendentes = sincronizacao.atualizar_se_inalteradas(
+            [t for t, _ in valores.values()],
+            [{"$set": {"valor_euro": valor}} for _, valor in valores.values()],
+            PROJECAO_TAREFA,
+        )
+        rollup.aplicar([
+            alteracao
+            for t in gravadas
+            for alteracao in ((t, -1), ({**t, "valor_euro": valores[t["_id"]][1]}, 1))
+        ])
+        alterados += len(gravadas)
+
+    return {
+        "ultimo_id": tarefas[-1]["_id"],
+        "processados": job.get("processados", 0) + len(tarefas),
+        "alterados": job.get("alterados", 0) + alterados,
+    }
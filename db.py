@@ -1,6 +1,12 @@
 import os
+import threading
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from config import (
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS, MONGO_COMPRESSORS
+)
 
 # Carrega variáveis do .env (funciona localmente)
 load_dotenv()
@@ -10,16 +16,106 @@ MONGODB_URL = os.getenv("MONGODB_URL")
 DB_NAME = os.getenv("DB_NAME")
 
 
+# --- Ligação ao MongoDB (lazy e segura para fork) ---
+# O MongoClient só é criado no primeiro acesso e nunca é partilhado entre processos:
+# se o pid mudar (worker criado por fork), é criado um cliente novo nesse processo.
+_client = None
+_client_pid = None
+_lock = threading.Lock()
 
-# Verificação para evitar erro se faltar variável
-if not MONGODB_URL:
-    raise ValueError("❌ MONGO_URI não foi definida. Verifica as variáveis no Railway.")
-if not DB_NAME:
-    raise ValueError("❌ DB_NAME não foi definida. Verifica as variáveis no Railway.")
 
-# Conexão com MongoDB
-client = MongoClient(MONGODB_URL)
-db = client[DB_NAME]
+# Opções do pool lidas do ambiente (ver config.py); omite as que não foram definidas.
+def opcoes_cliente() -> dict:
+    opcoes = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+    if MONGO_COMPRESSORS:
+        opcoes["compressors"] = MONGO_COMPRESSORS
+
+    return {k: v for k, v in opcoes.items() if v is not None}
+
+
+def get_client() -> MongoClient:
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            # Verificação para evitar erro se faltar variável
+            if not MONGODB_URL:
+                raise ValueError("❌ MONGO_URI não foi definida. Verifica as variáveis no Railway.")
+            if not DB_NAME:
+                raise ValueError("❌ DB_NAME não foi definida. Verifica as variáveis no Railway.")
+
+            # O cliente herdado do processo pai é descartado sem o fechar
+            # (os sockets pertencem ao pai).
+            _client = MongoClient(MONGODB_URL, connect=False, **opcoes_cliente())
+            _client_pid = pid
+
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+# Fecha o cliente do processo atual (chamado no shutdown da aplicação).
+def close_client():
+    global _client, _client_pid
+
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+# --- Acesso lazy às coleções ---
+# Permite continuar a usar "from db import tasks_collection" e db["tasks"] nos módulos
+# sem abrir ligação na importação. A coleção real é resolvida no primeiro uso
+# e reaproveitada enquanto o cliente não mudar.
+class LazyCollection:
+    def __init__(self, nome: str):
+        self._nome = nome
+        self._client = None
+        self._collection = None
+
+    def _resolver(self):
+        client = get_client()
+        if self._client is not client:
+            self._collection = client[DB_NAME][self._nome]
+            self._client = client
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolver(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._nome!r})"
+
+
+class LazyDatabase:
+    def __init__(self):
+        self._colecoes = {}
+
+    def __getitem__(self, nome: str) -> LazyCollection:
+        if nome not in self._colecoes:
+            self._colecoes[nome] = LazyCollection(nome)
+        return self._colecoes[nome]
+
+    def __getattr__(self, attr):
+        return getattr(get_db(), attr)
+
+
+db = LazyDatabase()
 
 
 # Coleções principais da base de dados
@@ -34,4 +130,12 @@ presets_collection = db["presets"]
 tasks_collection = db["tasks"]
 
 
-
+# --- Índices das coleções principais ---
+# Garantidos no arranque da aplicação (create_index é idempotente).
+def criar_indices():
+    tasks_collection.create_index([("cliente", ASCENDING), ("contrato", ASCENDING), ("atividade", ASCENDING)])
+    tasks_collection.create_index([("username", ASCENDING), ("data_iso", ASCENDING)])
+    tasks_collection.create_index([("cliente", ASCENDING), ("data_iso", ASCENDING)])
+    tasks_collection.create_index([("data_iso", ASCENDING)])
+    contracts_collection.create_index([("contrato", ASCENDING), ("cliente", ASCENDING)])
+    activities_collection.create_index([("atividade", ASCENDING)])
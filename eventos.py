@@ -0,0 +1,216 @@
+import asyncio
+import json
+import threading
+import traceback
+from datetime import datetime
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from db import db
+from config import EVENT_BUS, WEB_CONCURRENCY
+
+# --- Eventos em tempo real (SSE) ---
+# As escritas de tarefas e agenda publicam eventos que são entregues aos clientes
+# ligados a GET /events/stream. Cada worker tem o seu difusor local (uma fila asyncio
+# por subscritor). Com vários workers, EVENT_BUS escolhe como os eventos chegam aos outros:
+#   local  → só os subscritores do worker que fez a escrita (um único worker)
+#   mongo  → os eventos passam por uma coleção capped (events_bus) que todos os workers seguem
+events_collection = db["events_bus"]
+
+# Tamanho da coleção capped (bytes); só precisa de guardar os eventos dos últimos segundos.
+TAMANHO_BUS = 16 * 1024 * 1024
+
+# Eventos por entregar a um subscritor; se a fila encher, o subscritor recebe "resync".
+TAMANHO_FILA = 256
+
+
+# --- Subscritores locais ---
+class Subscritor:
+    def __init__(self, username: str, role: str):
+        self.username = username
+        self.role = role
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+
+    # As tarefas só são visíveis ao dono e aos administradores; a agenda é visível a todos
+    # (tal como em GET /tasks e GET /agenda/).
+    def pode_ver(self, evento: dict) -> bool:
+        if evento["tipo"] == "task":
+            return self.role == "admin" or evento.get("username") == self.username
+        return True
+
+    # Corre no loop do subscritor.
+    def _entregar(self, evento):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: descarta o atraso e pede-lhe que volte a sincronizar.
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait({"tipo": "sistema", "acao": "resync"})
+
+
+class Difusor:
+    def __init__(self):
+        self._subscritores = set()
+        self._lock = threading.Lock()
+
+    def subscrever(self, username: str, role: str) -> Subscritor:
+        sub = Subscritor(username, role)
+        with self._lock:
+            self._subscritores.add(sub)
+        return sub
+
+    def cancelar(self, sub: Subscritor):
+        with self._lock:
+            self._subscritores.discard(sub)
+
+    # Pode ser chamado de qualquer thread (endpoints síncronos correm no threadpool).
+    def entregar(self, evento: dict):
+        with self._lock:
+            subscritores = list(self._subscritores)
+
+        for sub in subscritores:
+            if sub.pode_ver(evento):
+                sub.loop.call_soon_threadsafe(sub._entregar, evento)
+
+    def fechar(self):
+        with self._lock:
+            subscritores = list(self._subscritores)
+        for sub in subscritores:
+            sub.loop.call_soon_threadsafe(sub._entregar, None)
+
+    def __len__(self):
+        return len(self._subscritores)
+
+
+difusor = Difusor()
+
+
+# --- Barramentos entre workers ---
+class BusLocal:
+    def publicar(self, evento: dict):
+        difusor.entregar(evento)
+
+    def iniciar(self):
+        pass
+
+    def parar(self):
+        pass
+
+
+class BusMongo:
+    def __init__(self):
+        self._parar = threading.Event()
+        self._thread = None
+
+    def publicar(self, evento: dict):
+        # O _id (ObjectId) também serve de id do evento SSE; a entrega local é feita pelo seguidor.
+        events_collection.insert_one(dict(evento))
+
+    def iniciar(self):
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._seguir, name="events-bus", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # Segue a coleção capped com um cursor tailable a partir do último evento existente.
+    # Os ObjectId gerados por processos diferentes não seguem a ordem de inserção, por isso
+    # a posição é a ordem natural da coleção: ao (re)abrir o cursor, os eventos são lidos
+    # desde o início e ignorados até aparecer o último já entregue.
+    def _seguir(self):
+        doc = None
+        try:
+            doc = events_collection.find_one(sort=[("$natural", -1)])
+        except Exception:
+            traceback.print_exc()
+        ultimo = doc["_id"] if doc else None
+
+        while not self._parar.is_set():
+            try:
+                cursor = events_collection.find({}, cursor_type=CursorType.TAILABLE_AWAIT).max_await_time_ms(1000)
+                a_saltar = ultimo is not None
+                primeira_leitura = True
+
+                while cursor.alive and not self._parar.is_set():
+                    for doc in cursor:
+                        if a_saltar:
+                            a_saltar = doc["_id"] != ultimo
+                            continue
+                        ultimo = doc["_id"]
+                        doc["id_evento"] = str(doc.pop("_id"))
+                        difusor.entregar(doc)
+                        if self._parar.is_set():
+                            break
+
+                    if a_saltar and primeira_leitura:
+                        # O último evento entregue já saiu da coleção capped: pode ter havido
+                        # perdas, os clientes voltam a sincronizar e segue-se a partir daqui.
+                        difusor.entregar({"tipo": "sistema", "acao": "resync"})
+                        a_saltar = False
+                    primeira_leitura = False
+
+            except Exception:
+                traceback.print_exc()
+            self._parar.wait(1)
+
+
+bus = BusMongo() if EVENT_BUS == "mongo" else BusLocal()
+
+
+def criar_indices():
+    if EVENT_BUS != "mongo":
+        return
+    try:
+        db.create_collection("events_bus", capped=True, size=TAMANHO_BUS)
+    except CollectionInvalid:
+        pass
+
+
+# Publica uma alteração. tipo: "task" | "agenda"; acao: "created" | "updated" | "deleted".
+# Uma falha na publicação nunca faz falhar a escrita que a originou.
+def publicar(tipo: str, acao: str, documento: dict, username: str = None):
+    dados = {k: v for k, v in documento.items() if k != "_id"}
+    if "_id" in documento:
+        dados["id"] = str(documento["_id"])
+
+    evento = {
+        "tipo": tipo,
+        "acao": acao,
+        "id": dados.get("id"),
+        "username": username,
+        "dados": dados if acao != "deleted" else {"id": dados.get("id")},
+        "em": datetime.utcnow(),
+    }
+
+    try:
+        bus.publicar(evento)
+    except Exception as e:
+        print(f"⚠️ [eventos] Falha ao publicar {tipo}.{acao}:", e)
+
+
+def iniciar():
+    if EVENT_BUS != "mongo" and WEB_CONCURRENCY > 1:
+        print(f"⚠️ EVENT_BUS={EVENT_BUS} com WEB_CONCURRENCY={WEB_CONCURRENCY}: "
+              "cada cliente SSE só recebe as escritas do seu worker.")
+    bus.iniciar()
+
+
+def parar():
+    difusor.fechar()
+    bus.parar()
+
+
+# Formata um evento no protocolo SSE.
+def formatar_sse(evento: dict) -> str:
+    linhas = []
+    if evento.get("id_evento"):
+        linhas.append(f"id: {evento['id_evento']}")
+    linhas.append(f"event: {evento['tipo']}.{evento['acao']}")
+    dados = {k: v for k, v in evento.items() if k not in ("id_evento", "_id")}
+    linhas.append("data: " + json.dumps(dados, default=str, ensure_ascii=False))
+    return "\n".join(linhas) + "\n\n"
@@ -0,0 +1,70 @@
+from typing import Optional
+from pymongo import GEOSPHERE
+from db import clients_collection, partners_collection
+
+# --- Localização de clientes e parceiros ---
+# latitude/longitude continuam a ser guardados como chegam (números nos clientes,
+# texto nos parceiros); "location" é a forma normalizada em GeoJSON, com índice
+# 2dsphere, usada nas pesquisas por proximidade (GET /clients/near, /partners/near).
+# Documentos sem coordenadas válidas ficam com location = null (fora do índice).
+
+# Raio máximo aceite nas pesquisas (km) e número máximo de resultados.
+RAIO_MAXIMO_KM = 500
+LIMITE_MAXIMO = 100
+
+
+def criar_indices():
+    clients_collection.create_index([("location", GEOSPHERE)])
+    partners_collection.create_index([("location", GEOSPHERE)])
+
+
+def _coordenada(valor, limite: float) -> Optional[float]:
+    if isinstance(valor, bool) or valor is None:
+        return None
+    try:
+        numero = float(str(valor).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return numero if -limite <= numero <= limite else None
+
+
+# Ponto GeoJSON a partir de latitude/longitude (número ou texto), ou None se forem inválidas.
+def ponto(latitude, longitude) -> Optional[dict]:
+    lat = _coordenada(latitude, 90)
+    lng = _coordenada(longitude, 180)
+    if lat is None or lng is None:
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+# Campo "location" a gravar com um documento novo ou com uma atualização parcial
+# (existente = documento antes da atualização). Vazio se as coordenadas não mudarem.
+def campos_localizacao(dados: dict, existente: dict = None) -> dict:
+    if "latitude" not in dados and "longitude" not in dados and existente is not None:
+        return {}
+
+    atual = {**(existente or {}), **dados}
+    return {"location": ponto(atual.get("latitude"), atual.get("longitude"))}
+
+
+# Os "limite" documentos mais próximos de (lat, lng) num raio de "raio_km",
+# do mais próximo para o mais afastado, com a distância em metros (distancia_m).
+def proximos(colecao, lat: float, lng: float, raio_km: float, limite: int) -> list:
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "key": "location",
+            "distanceField": "distancia_m",
+            "maxDistance": raio_km * 1000,
+            "spherical": True,
+        }},
+        {"$limit": limite},
+        {"$project": {"location": 0}},
+    ]
+
+    resultado = []
+    for doc in colecao.aggregate(pipeline):
+        doc["id"] = str(doc.pop("_id"))
+        doc["distancia_m"] = round(doc["distancia_m"])
+        resultado.append(doc)
+    return resultado
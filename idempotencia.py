@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from anyio import to_thread
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from db import db
+
+# --- Pedidos idempotentes (cabeçalho Idempotency-Key) ---
+# Um cliente que repete um POST (ex.: PowerApps após timeout) com a mesma chave recebe
+# a resposta original em vez de criar um duplicado. Cada chave fica na coleção
+# idempotency_keys com _id = "<identidade>:<chave>"; o _id único garante que, entre
+# pedidos simultâneos com a mesma chave, só um executa (os outros recebem 409).
+idempotency_collection = db["idempotency_keys"]
+
+# Tempo durante o qual a resposta original é devolvida às repetições.
+VALIDADE = timedelta(hours=24)
+
+# Uma chave "pendente" há mais do que isto é considerada abandonada (ex.: worker reiniciado).
+PENDENTE_EXPIRA = timedelta(seconds=60)
+
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+def criar_indices():
+    idempotency_collection.create_index([("expira_em", ASCENDING)], expireAfterSeconds=0)
+
+
+def _impressao(corpo: bytes) -> str:
+    return hashlib.sha256(corpo or b"").hexdigest()
+
+
+# Reserva a chave para este pedido. Devolve o documento guardado se for uma repetição
+# de um pedido já concluído, ou None se este pedido deve ser executado.
+def _reservar(_id: str, impressao: str):
+    agora = datetime.utcnow()
+
+    try:
+        idempotency_collection.insert_one({
+            "_id": _id,
+            "estado": "pendente",
+            "impressao": impressao,
+            "criado_em": agora,
+            "expira_em": agora + VALIDADE,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    existente = idempotency_collection.find_one({"_id": _id})
+    if existente is None:
+        # Expirou entre o insert e a leitura: tenta de novo.
+        return _reservar(_id, impressao)
+
+    if existente.get("impressao") != impressao:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key já usada com um pedido diferente."
+        )
+
+    if existente["estado"] == "concluido":
+        return existente
+
+    # Pendente: outro pedido com a mesma chave está em curso, a menos que tenha sido abandonado.
+    retomado = idempotency_collection.find_one_and_update(
+        {"_id": _id, "estado": "pendente", "criado_em": {"$lt": agora - PENDENTE_EXPIRA}},
+        {"$set": {"criado_em": agora, "expira_em": agora + VALIDADE}},
+    )
+    if retomado is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Já existe um pedido em curso com esta Idempotency-Key.",
+            headers={"Retry-After": "2"},
+        )
+    return None
+
+
+# Início de um pedido com chave: devolve (_id, resposta guardada ou None).
+# Com resposta guardada o pedido é uma repetição e não deve ser executado.
+def iniciar(identidade: str, chave: str, corpo: bytes):
+    if len(chave) > TAMANHO_MAXIMO_CHAVE:
+        raise HTTPException(status_code=400, detail="Idempotency-Key demasiado longa.")
+
+    _id = f"{identidade}:{chave}"
+    existente = _reservar(_id, _impressao(corpo))
+    return _id, existente["resposta"] if existente is not None else None
+
+
+def concluir(_id: str, status_code: int, resposta):
+    idempotency_collection.update_one(
+        {"_id": _id},
+        {"$set": {
+            "estado": "concluido",
+            "status_code": status_code,
+            "resposta": jsonable_encoder(resposta),
+            "concluido_em": datetime.utcnow(),
+        }},
+    )
+
+
+# Liberta a chave quando o pedido falha sem ter gravado nada, para que possa ser repetido.
+def libertar(_id: str):
+    idempotency_collection.delete_one({"_id": _id, "estado": "pendente"})
+
+
+# Executa "criar" no máximo uma vez por (identidade, chave). Devolve (resposta, repetida).
+# Sem chave, limita-se a executar. Se "criar" falhar, a chave é libertada para nova tentativa:
+# "criar" só deve lançar exceções antes de gravar (depois disso regista a falha e devolve a resposta).
+def executar(identidade: str, chave: str, corpo: bytes, status_code: int, criar):
+    if not chave:
+        return criar(), False
+
+    _id, guardada = iniciar(identidade, chave, corpo)
+    if guardada is not None:
+        return guardada, True
+
+    try:
+        resposta = criar()
+    except Exception:
+        libertar(_id)
+        raise
+
+    concluir(_id, status_code, resposta)
+    return resposta, False
+
+
+# Igual a executar(), para quando "criar" é uma corrotina. A criação e o registo da
+# resposta continuam mesmo que o cliente desligue a meio, para que a repetição a encontre.
+# As operações na coleção das chaves correm numa thread, fora do event loop.
+async def executar_async(identidade: str, chave: str, corpo: bytes, status_code: int, criar):
+    if not chave:
+        return await criar(), False
+
+    _id, guardada = await to_thread.run_sync(iniciar, identidade, chave, corpo)
+    if guardada is not None:
+        return guardada, True
+
+    async def criar_e_concluir():
+        try:
+            resposta = await criar()
+        except Exception:
+            await to_thread.run_sync(libertar, _id)
+            raise
+
+        await to_thread.run_sync(concluir, _id, status_code, resposta)
+        return resposta
+
+    return await asyncio.shield(asyncio.ensure_future(criar_e_concluir())), False
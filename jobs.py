@@ -0,0 +1,261 @@
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from db import db
+
+# --- Jobs de manutenção em lote (retomáveis) ---
+# Cada job fica guardado na coleção batch_jobs com o seu progresso (cursor "ultimo_id").
+# É processado em blocos numa thread de fundo; se o processo terminar a meio,
+# o job é retomado no próximo arranque (ou por outro worker quando o heartbeat expira).
+jobs_collection = db["batch_jobs"]
+
+# Tempo sem heartbeat a partir do qual um job "em_curso" é considerado abandonado.
+HEARTBEAT_EXPIRA = timedelta(minutes=2)
+
+# tipo → função(job) que processa um bloco.
+# A função devolve um dict com os campos a atualizar no job (ex.: ultimo_id, processados)
+# ou None quando já não há mais nada a processar.
+HANDLERS = {}
+
+# Lançada por iniciar() quando já existe um job ativo com a mesma chave "exclusivo".
+class JobEmCurso(Exception):
+    def __init__(self, job_id: str):
+        super().__init__(job_id)
+        self.job_id = job_id
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_parar = threading.Event()
+
+
+def handler(tipo: str):
+    def registar(fn):
+        HANDLERS[tipo] = fn
+        return fn
+    return registar
+
+
+# O executor é criado no primeiro uso (em cada worker) e descartado no shutdown.
+def _submeter(job_id):
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch-job")
+        _executor.submit(_executar, job_id)
+
+
+def criar_indices():
+    jobs_collection.create_index([("estado", ASCENDING), ("heartbeat", ASCENDING)])
+    # Só existe um job ativo por chave "exclusivo" (o campo é removido quando o job termina).
+    jobs_collection.create_index(
+        [("exclusivo", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"exclusivo": {"$exists": True}},
+    )
+
+
+# Cria um job e começa a processá-lo em segundo plano. Devolve o id (string).
+# Com "exclusivo", lança JobEmCurso se já houver um job ativo com a mesma chave.
+# Com reservar=True o job fica "reservado" (com a chave, mas sem ser processado)
+# até confirmar() ou cancelar(): permite reservar a chave antes de uma escrita.
+def iniciar(tipo: str, params: dict, exclusivo: str = None, reservar: bool = False) -> str:
+    if tipo not in HANDLERS:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+
+    agora = datetime.utcnow()
+    documento = {
+        "tipo": tipo,
+        "params": params,
+        "estado": "reservado" if reservar else "pendente",
+        "ultimo_id": None,
+        "processados": 0,
+        "criado_em": agora,
+        "atualizado_em": agora,
+    }
+    if exclusivo:
+        documento["exclusivo"] = exclusivo
+
+    try:
+        result = jobs_collection.insert_one(documento)
+    except DuplicateKeyError:
+        job_id = ativo(exclusivo)
+        if job_id is None or _cancelar_reserva_abandonada(exclusivo):
+            # Terminou entre o insert e a leitura (ou era uma reserva abandonada): tenta de novo.
+            return iniciar(tipo, params, exclusivo, reservar)
+        raise JobEmCurso(job_id)
+
+    if not reservar:
+        _submeter(result.inserted_id)
+    return str(result.inserted_id)
+
+
+# Começa a processar um job reservado.
+def confirmar(job_id: str):
+    jobs_collection.update_one(
+        {"_id": ObjectId(job_id), "estado": "reservado"},
+        {"$set": {"estado": "pendente", "atualizado_em": datetime.utcnow()}},
+    )
+    _submeter(ObjectId(job_id))
+
+
+# Descarta um job reservado e liberta a sua chave "exclusivo".
+def cancelar(job_id: str):
+    jobs_collection.update_one(
+        {"_id": ObjectId(job_id), "estado": "reservado"},
+        {"$set": {"estado": "cancelado", "atualizado_em": datetime.utcnow()}, "$unset": {"exclusivo": ""}},
+    )
+
+
+# Uma reserva nunca confirmada (ex.: processo terminado entre reservar e confirmar)
+# deixa de bloquear a chave ao fim de HEARTBEAT_EXPIRA.
+def _cancelar_reserva_abandonada(exclusivo: str) -> bool:
+    result = jobs_collection.update_one(
+        {"exclusivo": exclusivo, "estado": "reservado", "criado_em": {"$lt": datetime.utcnow() - HEARTBEAT_EXPIRA}},
+        {"$set": {"estado": "cancelado", "atualizado_em": datetime.utcnow()}, "$unset": {"exclusivo": ""}},
+    )
+    return result.modified_count > 0
+
+
+# Id do job ativo com a chave "exclusivo", ou None.
+def ativo(exclusivo: str):
+    job = jobs_collection.find_one({"exclusivo": exclusivo}, {"_id": 1})
+    return str(job["_id"]) if job else None
+
+
+# Pede ao job ativo com a chave "exclusivo" que recomece do início (ultimo_id = None)
+# com os params atualizados; quem o executa nota-o no fim do bloco em curso.
+# Devolve o id, ou None se não houver job ativo com essa chave.
+def reiniciar(exclusivo: str, params: dict = None):
+    job = jobs_collection.find_one_and_update(
+        {"exclusivo": exclusivo},
+        {
+            "$inc": {"reinicios": 1},
+            "$set": {
+                "ultimo_id": None,
+                "atualizado_em": datetime.utcnow(),
+                **{f"params.{k}": v for k, v in (params or {}).items()},
+            },
+        },
+        {"_id": 1},
+    )
+    return str(job["_id"]) if job else None
+
+
+def obter(job_id: str):
+    job = jobs_collection.find_one({"_id": ObjectId(job_id)})
+    if job:
+        job["id"] = str(job.pop("_id"))
+        if job.get("ultimo_id") is not None:
+            job["ultimo_id"] = str(job["ultimo_id"])
+    return job
+
+
+# Reserva o job para este processo (atómico): só se estiver pendente ou abandonado.
+def _reservar(job_id):
+    agora = datetime.utcnow()
+    return jobs_collection.find_one_and_update(
+        {
+            "_id": job_id,
+            "$or": [
+                {"estado": "pendente"},
+                {"estado": "em_curso", "heartbeat": {"$lt": agora - HEARTBEAT_EXPIRA}},
+            ],
+        },
+        {"$set": {"estado": "em_curso", "dono": f"{socket.gethostname()}:{os.getpid()}", "heartbeat": agora}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _executar(job_id):
+    job = _reservar(job_id)
+    if not job:
+        return
+
+    fn = HANDLERS.get(job["tipo"])
+    try:
+        while not _parar.is_set():
+            progresso = fn(job)
+            agora = datetime.utcnow()
+            # Só grava se o job não foi reiniciado entretanto (ver reiniciar()).
+            filtro = {"_id": job_id, "reinicios": job.get("reinicios", {"$exists": False})}
+
+            if progresso is None:
+                result = jobs_collection.update_one(
+                    filtro,
+                    {
+                        "$set": {"estado": "concluido", "concluido_em": agora, "atualizado_em": agora},
+                        "$unset": {"exclusivo": ""},
+                    },
+                )
+                if result.matched_count:
+                    print(f"✅ Job {job['tipo']} {job_id} concluído ({job.get('processados', 0)} documentos)")
+                    return
+            else:
+                result = jobs_collection.update_one(
+                    filtro,
+                    {"$set": {**progresso, "heartbeat": agora, "atualizado_em": agora}},
+                )
+                if result.matched_count:
+                    job.update(progresso)
+
+            if not result.matched_count:
+                # Reiniciado: continua a partir do estado guardado (ultimo_id = None, params novos).
+                job = jobs_collection.find_one({"_id": job_id})
+
+        # Shutdown: devolve o job à fila para ser retomado no próximo arranque.
+        jobs_collection.update_one({"_id": job_id}, {"$set": {"estado": "pendente"}})
+
+    except Exception as e:
+        traceback.print_exc()
+        jobs_collection.update_one(
+            {"_id": job_id},
+            {
+                "$set": {"estado": "erro", "erro": str(e), "atualizado_em": datetime.utcnow()},
+                "$unset": {"exclusivo": ""},
+            },
+        )
+
+
+# Retoma jobs pendentes ou abandonados (chamado no arranque da aplicação).
+def retomar_pendentes():
+    _parar.clear()
+    limite = datetime.utcnow() - HEARTBEAT_EXPIRA
+    pendentes = jobs_collection.find(
+        {"$or": [
+            {"estado": "pendente"},
+            {"estado": "em_curso", "heartbeat": {"$lt": limite}},
+        ]},
+        {"_id": 1},
+    )
+    for job in pendentes:
+        _submeter(job["_id"])
+
+
+# Pede aos jobs em curso que parem no fim do bloco atual (chamado no shutdown).
+def parar():
+    global _executor
+
+    _parar.set()
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+# Espera interrompível (usada pelos handlers), termina cedo no shutdown.
+def esperar(segundos: float):
+    _parar.wait(max(0.0, segundos))
+
+
+# Remove o histórico de jobs concluídos há mais de "dias" dias (agendado no main.py).
+def limpar_concluidos(dias: int = 30):
+    limite = datetime.utcnow() - timedelta(days=dias)
+    jobs_collection.delete_many({"estado": "concluido", "concluido_em": {"$lt": limite}})
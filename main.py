@@ -1,15 +1,94 @@
+import time
+
+# Marca o início do arranque (antes de importar as rotas).
+INICIO_ARRANQUE = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes import (
     auth, clients, contracts, presets, projects,
-    products, activities, tasks, partners, agenda, users, auth_microsoft
+    products, activities, tasks, partners, agenda, users, auth_microsoft,
+    jobs as jobs_routes, scheduler as scheduler_routes, reports, events, autocomplete
 )
+import db
+import eventos
+import geo
+import idempotencia
+import jobs
+import migracoes
+import relatorios
+import rollup
+import sincronizacao
+from scheduler import agendador
+from config import THREADPOOL_SIZE, SCHEDULER_ENABLED
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-app = FastAPI(title="F5TCI Backend - Estrutura Modular")
+
+# Funções que garantem os índices necessários, executadas no arranque.
+INDICES = [
+    db.criar_indices, rollup.criar_indices, jobs.criar_indices, relatorios.criar_indices,
+    sincronizacao.criar_indices, eventos.criar_indices, idempotencia.criar_indices, geo.criar_indices,
+]
+
+
+# Jobs periódicos (horas em UTC). Com vários workers só um executa cada job.
+agendador.registar("recalcular_horas_projetos", projects.recalcular_todos_projetos, cron="0 2 * * *", jitter=60)
+agendador.registar("limpar_jobs_concluidos", jobs.limpar_concluidos, cron="30 3 * * *", jitter=60)
+
+
+# --- Ciclo de vida da aplicação ---
+# Nada de ligações externas na importação: o MongoClient e o cliente MSAL
+# são criados no primeiro uso em cada worker e fechados no shutdown.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Threads disponíveis para os endpoints síncronos deste worker.
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    # Índices (idempotente; uma falha não impede o arranque).
+    for criar_indices in INDICES:
+        try:
+            await to_thread.run_sync(criar_indices)
+        except Exception as e:
+            print(f"⚠️ Não foi possível criar índices ({criar_indices.__module__}):", e)
+
+    # Retoma jobs em lote interrompidos (ex.: recálculo de custos) e inicia migrações em falta.
+    try:
+        await to_thread.run_sync(jobs.retomar_pendentes)
+        await to_thread.run_sync(migracoes.garantir_migracoes)
+    except Exception as e:
+        print("⚠️ Não foi possível retomar jobs pendentes:", e)
+
+    eventos.iniciar()
+
+    if tasks.buffer_tarefas is not None:
+        tasks.buffer_tarefas.iniciar()
+
+    if SCHEDULER_ENABLED:
+        agendador.iniciar()
+
+    app.state.startup_ms = (time.perf_counter() - INICIO_ARRANQUE) * 1000
+    print(f"🚀 API pronta em {app.state.startup_ms:.0f} ms (pid {os.getpid()})")
+
+    yield
+
+    if tasks.buffer_tarefas is not None:
+        await tasks.buffer_tarefas.parar()
+    if SCHEDULER_ENABLED:
+        await agendador.parar()
+    await to_thread.run_sync(jobs.parar)
+    await to_thread.run_sync(relatorios.parar)
+    await to_thread.run_sync(eventos.parar)
+    auth_microsoft.close_msal_app()
+    db.close_client()
+    print(f"👋 API terminada (pid {os.getpid()})")
+
+
+app = FastAPI(title="F5TCI Backend - Estrutura Modular", lifespan=lifespan)
 
 # Lista de origens autorizadas (local + produção)
 origins = [
@@ -27,6 +106,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Job-Id", "Idempotent-Replayed", "X-Total-Count"],
 )
 
 # Registo das rotas
@@ -42,6 +122,11 @@ app.include_router(users.router)
 app.include_router(presets.router)
 app.include_router(projects.router)
 app.include_router(auth_microsoft.router)
+app.include_router(jobs_routes.router)
+app.include_router(scheduler_routes.router)
+app.include_router(reports.router)
+app.include_router(events.router)
+app.include_router(autocomplete.router)
 
 @app.get("/")
 def home():
@@ -0,0 +1,99 @@
+from pymongo import UpdateOne
+from db import clients_collection, partners_collection, tasks_collection
+from conversoes import data_iso, numero
+from geo import ponto
+import jobs
+
+# --- Migrações de dados (jobs retomáveis) ---
+# Preenchem campos derivados em documentos antigos. Cada migração é um job de
+# jobs.py, iniciado no arranque (garantir_migracoes) apenas se ainda houver
+# documentos por migrar e não existir já um job desse tipo por terminar.
+TAMANHO_BLOCO = 1000
+
+
+# --- Tarefas: data_iso e valor_euro numérico ---
+# data_iso ("AAAA-MM-DD") permite filtros de intervalo por data com índice;
+# valor_euro guardado como texto passa a número, para filtros valor_min/valor_max.
+FILTRO_TAREFAS_POR_MIGRAR = {"data_iso": {"$exists": False}}
+
+
+@jobs.handler("normalizar_tarefas")
+def _normalizar_tarefas(job: dict):
+    filtro = {}
+    if job.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": job["ultimo_id"]}
+
+    tarefas = list(
+        tasks_collection.find(filtro, {"data": 1, "valor_euro": 1}).sort("_id", 1).limit(TAMANHO_BLOCO)
+    )
+    if not tarefas:
+        return None
+
+    operacoes = []
+    for t in tarefas:
+        campos = {"data_iso": data_iso(t.get("data"))}
+        if not isinstance(t.get("valor_euro"), float):
+            campos["valor_euro"] = numero(t.get("valor_euro"))
+        operacoes.append(UpdateOne({"_id": t["_id"]}, {"$set": campos}))
+
+    tasks_collection.bulk_write(operacoes, ordered=False)
+
+    return {
+        "ultimo_id": tarefas[-1]["_id"],
+        "processados": job.get("processados", 0) + len(tarefas),
+    }
+
+
+# --- Clientes e parceiros: location (GeoJSON) ---
+# Preenche "location" a partir de latitude/longitude (null quando não são válidas),
+# para as pesquisas por proximidade com o índice 2dsphere (ver geo.py).
+FILTRO_SEM_LOCALIZACAO = {"location": {"$exists": False}}
+
+
+def _preencher_localizacao(colecao, job: dict):
+    filtro = dict(FILTRO_SEM_LOCALIZACAO)
+    if job.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": job["ultimo_id"]}
+
+    documentos = list(
+        colecao.find(filtro, {"latitude": 1, "longitude": 1}).sort("_id", 1).limit(TAMANHO_BLOCO)
+    )
+    if not documentos:
+        return None
+
+    colecao.bulk_write([
+        UpdateOne({"_id": d["_id"]}, {"$set": {"location": ponto(d.get("latitude"), d.get("longitude"))}})
+        for d in documentos
+    ], ordered=False)
+
+    return {
+        "ultimo_id": documentos[-1]["_id"],
+        "processados": job.get("processados", 0) + len(documentos),
+    }
+
+
+@jobs.handler("localizacao_clientes")
+def _localizacao_clientes(job: dict):
+    return _preencher_localizacao(clients_collection, job)
+
+
+@jobs.handler("localizacao_parceiros")
+def _localizacao_parceiros(job: dict):
+    return _preencher_localizacao(partners_collection, job)
+
+
+MIGRACOES = [
+    ("normalizar_tarefas", tasks_collection, FILTRO_TAREFAS_POR_MIGRAR),
+    ("localizacao_clientes", clients_collection, FILTRO_SEM_LOCALIZACAO),
+    ("localizacao_parceiros", partners_collection, FILTRO_SEM_LOCALIZACAO),
+]
+
+
+# Chamado no arranque: inicia as migrações que ainda têm trabalho por fazer.
+def garantir_migracoes():
+    for tipo, colecao, por_migrar in MIGRACOES:
+        if colecao.find_one(por_migrar, {"_id": 1}) is None:
+            continue
+        if jobs.jobs_collection.find_one({"tipo": tipo, "estado": {"$in": ["pendente", "em_curso"]}}, {"_id": 1}):
+            continue
+        jobs.iniciar(tipo, {})
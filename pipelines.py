@@ -0,0 +1,54 @@
+# --- Expressões de agregação reutilizáveis ---
+# Equivalentes em pipeline MongoDB das conversões de conversoes.py,
+# para cálculos feitos inteiramente no servidor.
+
+def _inteiro(expr):
+    return {"$convert": {"input": expr, "to": "int", "onError": 0, "onNull": 0}}
+
+
+# "HH:MM" → minutos (0 se o valor não for texto nesse formato), como conversoes.minutos.
+def minutos_expr(campo: str) -> dict:
+    return {
+        "$let": {
+            "vars": {
+                "partes": {
+                    "$cond": [
+                        {"$eq": [{"$type": campo}, "string"]},
+                        {"$split": [campo, ":"]},
+                        [],
+                    ]
+                }
+            },
+            "in": {
+                "$cond": [
+                    {"$eq": [{"$size": "$$partes"}, 2]},
+                    {
+                        "$add": [
+                            {"$multiply": [_inteiro({"$arrayElemAt": ["$$partes", 0]}), 60]},
+                            _inteiro({"$arrayElemAt": ["$$partes", 1]}),
+                        ]
+                    },
+                    0,
+                ]
+            },
+        }
+    }
+
+
+# Número guardado como texto ou número → double (0 se inválido), como conversoes.numero.
+def numero_expr(campo: str) -> dict:
+    return {"$convert": {"input": campo, "to": "double", "onError": 0, "onNull": 0}}
+
+
+# Campo "data" (nos formatos de conversoes.FORMATOS_DATA) → Date, ou null se não reconhecido.
+def data_expr(campo: str) -> dict:
+    expr = None
+    for fmt in reversed(("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")):
+        tentativa = {"$dateFromString": {"dateString": campo, "format": fmt, "onError": None, "onNull": None}}
+        expr = tentativa if expr is None else {"$ifNull": [tentativa, expr]}
+    return expr
+
+
+# Campo "data" → "AAAA-MM" (null se a data não for reconhecida).
+def mes_expr(campo: str) -> dict:
+    return {"$dateToString": {"date": data_expr(campo), "format": "%Y-%m", "onNull": None}}
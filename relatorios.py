@@ -0,0 +1,208 @@
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from db import db
+from config import REPORT_WORKERS, REPORT_MAX_PENDING, REPORT_TTL_SECONDS
+from consultas import iterar_todas_tarefas, atividade_mensal
+
+# --- Relatórios assíncronos ---
+# Consultas pesadas de administração (/tasks/all, /tasks/atividade) corridas fora do pedido HTTP.
+# O pedido cria um documento em report_jobs e o relatório é gerado num pool limitado de threads;
+# o resultado fica em report_results em blocos de linhas. Ambos expiram (índice TTL em expira_em),
+# e enquanto não expirarem um pedido igual reaproveita o mesmo relatório (exceto com refrescar=True).
+report_jobs_collection = db["report_jobs"]
+report_results_collection = db["report_results"]
+
+# Linhas por documento em report_results (bem abaixo do limite de 16 MB por documento).
+LINHAS_POR_BLOCO = 1000
+
+# Um relatório por concluir há mais do que isto é considerado interrompido (ex.: worker reiniciado).
+TEMPO_MAXIMO = timedelta(minutes=15)
+
+# tipo → função(params) que devolve as linhas do relatório (lista ou iterador).
+# As linhas são gravadas à medida que chegam, LINHAS_POR_BLOCO de cada vez.
+TIPOS = {
+    "tarefas": lambda params: iterar_todas_tarefas(),
+    "atividade": lambda params: atividade_mensal(params["mes"]),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_ativos = set()
+
+
+class LimiteExcedido(Exception):
+    pass
+
+
+def criar_indices():
+    report_jobs_collection.create_index([("expira_em", ASCENDING)], expireAfterSeconds=0)
+    report_jobs_collection.create_index([("tipo", ASCENDING), ("params", ASCENDING), ("criado_em", DESCENDING)])
+    report_results_collection.create_index([("expira_em", ASCENDING)], expireAfterSeconds=0)
+    report_results_collection.create_index([("job_id", ASCENDING), ("n", ASCENDING)])
+
+
+# Valida e normaliza os parâmetros de cada tipo (ValueError com mensagem para o cliente).
+def normalizar_params(tipo: str, mes: int = None) -> dict:
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de relatório desconhecido: {tipo}. Usa um de: {', '.join(TIPOS)}.")
+
+    if tipo == "atividade":
+        if mes is None or not 1 <= mes <= 12:
+            raise ValueError("Indica um mês entre 1 e 12.")
+        return {"mes": mes}
+
+    return {}
+
+
+def _interrompido(job: dict, agora: datetime) -> bool:
+    if job["estado"] not in ("pendente", "em_curso"):
+        return False
+    return job.get("iniciado_em", job["criado_em"]) < agora - TEMPO_MAXIMO
+
+
+def _formatar(job: dict) -> dict:
+    job = dict(job)
+    job["id"] = str(job.pop("_id"))
+    if _interrompido(job, datetime.utcnow()):
+        job["estado"] = "erro"
+        job["erro"] = "Relatório interrompido."
+    return job
+
+
+# Cria (ou reaproveita) um relatório. Devolve o documento do job já formatado.
+# Com refrescar=True um relatório já concluído não é reaproveitado (um em preparação ainda é).
+def pedir(tipo: str, params: dict, pedido_por: str, refrescar: bool = False) -> dict:
+    agora = datetime.utcnow()
+
+    estados = ["pendente", "em_curso"] if refrescar else ["pendente", "em_curso", "concluido"]
+    existente = report_jobs_collection.find_one(
+        {
+            "tipo": tipo,
+            "params": params,
+            "estado": {"$in": estados},
+            "expira_em": {"$gt": agora + timedelta(seconds=60)},
+        },
+        sort=[("criado_em", DESCENDING)],
+    )
+    if existente and not _interrompido(existente, agora):
+        return _formatar(existente)
+
+    job = {
+        "tipo": tipo,
+        "params": params,
+        "estado": "pendente",
+        "pedido_por": pedido_por,
+        "linhas": None,
+        "criado_em": agora,
+        "expira_em": agora + timedelta(seconds=REPORT_TTL_SECONDS),
+    }
+    _submeter(job)
+    return _formatar(job)
+
+
+# O executor é criado no primeiro uso (em cada worker) e descartado no shutdown.
+# O número de relatórios à espera ou em curso por worker é limitado a REPORT_MAX_PENDING.
+def _submeter(job: dict):
+    global _executor
+
+    with _executor_lock:
+        if len(_ativos) >= REPORT_MAX_PENDING:
+            raise LimiteExcedido()
+
+        job["_id"] = report_jobs_collection.insert_one(job).inserted_id
+
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+        _ativos.add(job["_id"])
+        _executor.submit(_executar, job["_id"])
+
+
+def _executar(job_id):
+    try:
+        job = report_jobs_collection.find_one_and_update(
+            {"_id": job_id, "estado": "pendente"},
+            {"$set": {
+                "estado": "em_curso",
+                "iniciado_em": datetime.utcnow(),
+                "dono": f"{socket.gethostname()}:{os.getpid()}",
+            }},
+        )
+        if not job:
+            return
+
+        total = 0
+        bloco = []
+        for linha in TIPOS[job["tipo"]](job["params"]):
+            bloco.append(linha)
+            if len(bloco) == LINHAS_POR_BLOCO:
+                _gravar_bloco(job, total // LINHAS_POR_BLOCO, bloco)
+                total += len(bloco)
+                bloco = []
+        if bloco:
+            _gravar_bloco(job, total // LINHAS_POR_BLOCO, bloco)
+            total += len(bloco)
+
+        report_jobs_collection.update_one(
+            {"_id": job_id},
+            {"$set": {"estado": "concluido", "linhas": total, "concluido_em": datetime.utcnow()}},
+        )
+        print(f"📊 Relatório {job['tipo']} {job_id} concluído ({total} linhas)")
+
+    except Exception as e:
+        traceback.print_exc()
+        report_jobs_collection.update_one(
+            {"_id": job_id},
+            {"$set": {"estado": "erro", "erro": str(e), "concluido_em": datetime.utcnow()}},
+        )
+
+    finally:
+        with _executor_lock:
+            _ativos.discard(job_id)
+
+
+def _gravar_bloco(job: dict, n: int, linhas: list):
+    report_results_collection.insert_one(
+        {"job_id": job["_id"], "n": n, "linhas": linhas, "expira_em": job["expira_em"]}
+    )
+
+
+def obter(job_id: str):
+    job = report_jobs_collection.find_one({"_id": ObjectId(job_id)})
+    return _formatar(job) if job else None
+
+
+# Linhas do resultado, bloco a bloco (para enviar em streaming sem carregar tudo).
+def linhas(job_id: str):
+    blocos = report_results_collection.find({"job_id": ObjectId(job_id)}, {"linhas": 1}).sort("n", ASCENDING)
+    for bloco in blocos:
+        yield from bloco["linhas"]
+
+
+# Termina o pool deste worker (chamado no shutdown). Os relatórios deste worker que ainda
+# não começaram são cancelados e marcados como erro, para que um novo pedido os volte a gerar.
+def parar():
+    global _executor
+
+    with _executor_lock:
+        executor, _executor = _executor, None
+
+    if executor is None:
+        return
+
+    executor.shutdown(wait=True, cancel_futures=True)
+
+    with _executor_lock:
+        cancelados = list(_ativos)
+        _ativos.clear()
+
+    if cancelados:
+        report_jobs_collection.update_many(
+            {"_id": {"$in": cancelados}, "estado": "pendente"},
+            {"$set": {"estado": "erro", "erro": "Relatório cancelado no shutdown."}},
+        )
@@ -0,0 +1,144 @@
+from datetime import datetime
+from bson import ObjectId
+from db import db
+from cache import incrementar_versoes
+from custos import PROJECAO_TAREFA, TENTATIVAS
+import catalogo
+import jobs
+import rollup
+import sincronizacao
+from routes.projects import chave_versao_projeto
+
+# --- Propagação de mudanças de nome (clientes e contratos) ---
+# Tarefas, projetos, presets (e contratos, no caso dos clientes) referem clientes e
+# contratos pelo nome. Quando um nome muda, um job retomável (ver jobs.py) percorre
+# cada coleção em blocos e aplica um update_many por bloco, limitado aos _id do bloco.
+# Nas tarefas, a escrita é condicionada à revisao lida e o rollup recebe as diferenças
+# (-nome antigo/+nome novo) só das tarefas gravadas, como em custos.py.
+# Progresso em GET /jobs/{id}.
+# Só há uma renomeação ativa por cliente/contrato: com A→B ainda em curso, B→C não
+# encontraria as tarefas que ainda estão em A. O mesmo entre um cliente e os seus
+# contratos, que também são procurados pelo nome do cliente. A chave é reservada antes
+# de gravar o novo nome (reservar), e o job só começa depois dessa escrita (jobs.confirmar).
+TAMANHO_BLOCO = 1000
+
+# Coleções atualizadas, por ordem, para cada tipo de mudança.
+COLECOES = {
+    "cliente": ("contracts", "tasks", "projects", "presets"),
+    "contrato": ("tasks", "projects", "presets"),
+}
+
+
+# Reserva a propagação de "entidade_id": os documentos que respeitam "de" passam a ter
+# os valores de "para". Lança jobs.JobEmCurso se a entidade, ou outra renomeação com
+# os mesmos clientes, já estiver ativa.
+# Cliente: de={"cliente": antigo}, para={"cliente": novo}.
+# Contrato: de={"cliente": c, "contrato": antigo}, para={"cliente": c2, "contrato": novo}.
+def reservar(tipo: str, entidade_id: str, de: dict, para: dict) -> str:
+    job_id = jobs.iniciar(
+        "propagar_renomeacao",
+        {"tipo": tipo, "de": de, "para": para},
+        exclusivo=f"renomear:{tipo}:{entidade_id}",
+        reservar=True,
+    )
+
+    # Cliente e contrato têm chaves diferentes: o conflito procura-se pelos nomes do cliente.
+    # Dois pedidos em simultâneo veem-se um ao outro e são ambos recusados.
+    clientes = [c for c in {de.get("cliente"), para.get("cliente")} if c]
+    conflito = jobs.jobs_collection.find_one(
+        {
+            "_id": {"$ne": ObjectId(job_id)},
+            "tipo": "propagar_renomeacao",
+            "exclusivo": {"$exists": True},
+            "$or": [{"params.de.cliente": {"$in": clientes}}, {"params.para.cliente": {"$in": clientes}}],
+            "$nor": [{"estado": "reservado", "criado_em": {"$lt": datetime.utcnow() - jobs.HEARTBEAT_EXPIRA}}],
+        },
+        {"_id": 1},
+    )
+    if conflito:
+        jobs.cancelar(job_id)
+        raise jobs.JobEmCurso(str(conflito["_id"]))
+
+    return job_id
+
+
+# Versões de cache a incrementar depois de alterar estas tarefas (decomposição por
+# projeto e facetas por utilizador), com o nome antigo e o novo.
+def _chaves_versao(tarefas: list, para: dict) -> set:
+    chaves = set()
+    for t in tarefas:
+        depois = {**t, **para}
+        chaves.add(chave_versao_projeto(t.get("cliente"), t.get("contrato")))
+        chaves.add(chave_versao_projeto(depois.get("cliente"), depois.get("contrato")))
+        if t.get("username"):
+            chaves.add(f"tarefas:{t['username']}")
+    return chaves
+
+
+# Renomeia um bloco de tarefas só onde não mudaram desde a leitura (ver
+# sincronizacao.atualizar_se_inalteradas). As alteradas entretanto que ainda
+# usam o nome antigo são tentadas de novo. Devolve o número de tarefas gravadas.
+def _renomear_tarefas(tarefas: list, de: dict, para: dict) -> int:
+    gravadas_total = 0
+    pendentes = tarefas
+
+    for _ in range(TENTATIVAS):
+        pendentes = [t for t in pendentes if all(t.get(campo) == valor for campo, valor in de.items())]
+        if not pendentes:
+            break
+
+        gravadas, pendentes = sincronizacao.atualizar_se_inalteradas(
+            pendentes, [{"$set": dict(para)} for _ in pendentes], PROJECAO_TAREFA
+        )
+        rollup.aplicar([
+            alteracao
+            for t in gravadas
+            for alteracao in ((t, -1), ({**t, **para}, 1))
+        ])
+        incrementar_versoes(_chaves_versao(gravadas, para))
+        gravadas_total += len(gravadas)
+
+    return gravadas_total
+
+
+@jobs.handler("propagar_renomeacao")
+def _propagar_bloco(job: dict):
+    params = job["params"]
+    colecoes = COLECOES[params["tipo"]]
+    fase = job.get("fase", 0)
+
+    if fase >= len(colecoes):
+        print(f"✅ Renomeação propagada: {params['de']} → {params['para']}")
+        return None
+
+    nome = colecoes[fase]
+    colecao = db[nome]
+
+    filtro = dict(params["de"])
+    if job.get("ultimo_id") is not None:
+        filtro["_id"] = {"$gt": job["ultimo_id"]}
+
+    projecao = PROJECAO_TAREFA if nome == "tasks" else {"_id": 1}
+    documentos = list(colecao.find(filtro, projecao).sort("_id", 1).limit(TAMANHO_BLOCO))
+    por_colecao = dict(job.get("por_colecao", {}))
+
+    if not documentos:
+        # Coleção terminada: passa à seguinte.
+        if nome == "contracts":
+            catalogo.invalidar("contracts")
+        return {"fase": fase + 1, "ultimo_id": None, "por_colecao": por_colecao}
+
+    ids = [d["_id"] for d in documentos]
+    if nome == "tasks":
+        modificados = _renomear_tarefas(documentos, params["de"], params["para"])
+    else:
+        # O filtro "de" repete-se para não tocar em documentos alterados entretanto.
+        result = colecao.update_many({**params["de"], "_id": {"$in": ids}}, {"$set": dict(params["para"])})
+        modificados = result.modified_count
+    por_colecao[nome] = por_colecao.get(nome, 0) + modificados
+
+    return {
+        "ultimo_id": ids[-1],
+        "processados": job.get("processados", 0) + modificados,
+        "por_colecao": por_colecao,
+    }
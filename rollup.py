@@ -0,0 +1,99 @@
+from pymongo import ASCENDING, UpdateOne
+from db import db, tasks_collection
+from conversoes import parse_data, minutos, numero
+
+# --- Rollup diário de horas ---
+# Uma linha por (dia, username, cliente, contrato, atividade) com os totais das tarefas.
+# É mantido incrementalmente pelos endpoints de tarefas e pode ser reconstruído
+# a partir da coleção "tasks" (ver tools/rebuild_rollup.py).
+rollup_collection = db["tasks_daily_rollup"]
+
+CAMPOS_CHAVE = ("dia", "username", "cliente", "contrato", "atividade")
+
+
+def criar_indices():
+    rollup_collection.create_index(
+        [(campo, ASCENDING) for campo in CAMPOS_CHAVE],
+        unique=True,
+        name="chave_rollup",
+    )
+    rollup_collection.create_index([("cliente", ASCENDING), ("contrato", ASCENDING), ("dia", ASCENDING)])
+    rollup_collection.create_index([("username", ASCENDING), ("dia", ASCENDING)])
+
+
+# Chave da linha de rollup de uma tarefa; tarefas sem data reconhecida ficam com dia None.
+def chave(task: dict) -> dict:
+    data = parse_data(task.get("data"))
+
+    return {
+        "dia": data.strftime("%Y-%m-%d") if data else None,
+        "username": task.get("username"),
+        "cliente": task.get("cliente"),
+        "contrato": task.get("contrato"),
+        "atividade": task.get("atividade"),
+    }
+
+
+# Valores somados por cada tarefa.
+def totais(task: dict) -> dict:
+    return {
+        "tarefas": 1,
+        "minutos": minutos(task.get("tempo_atividade")),
+        "minutos_faturados": minutos(task.get("tempo_faturado")),
+        "minutos_viagem": minutos(task.get("tempo_viagem")),
+        "km_viagem": numero(task.get("distancia_viagem")),
+        "valor_euro": numero(task.get("valor_euro")),
+    }
+
+
+def operacao(task: dict, sinal: int) -> UpdateOne:
+    incrementos = {campo: valor * sinal for campo, valor in totais(task).items()}
+    return UpdateOne(chave(task), {"$inc": incrementos}, upsert=True)
+
+
+# --- Atualização incremental ---
+# Recebe pares (tarefa, +1/-1) e aplica-os num único bulk_write.
+# Linhas que ficam sem tarefas são removidas (só entre as chaves decrementadas,
+# procuradas pelo índice único; "tarefas" não tem índice).
+def aplicar(alteracoes: list):
+    if not alteracoes:
+        return
+
+    rollup_collection.bulk_write([operacao(t, sinal) for t, sinal in alteracoes], ordered=False)
+
+    decrementadas = {tuple(chave(t).items()) for t, sinal in alteracoes if sinal < 0}
+    if decrementadas:
+        rollup_collection.delete_many({
+            "$or": [dict(k) for k in decrementadas],
+            "tarefas": {"$lte": 0},
+        })
+
+
+# --- Reconstrução completa ---
+# Recalcula as linhas a partir das tarefas que respeitam o filtro (todas por omissão)
+# e substitui as linhas de rollup correspondentes. Devolve o número de linhas escritas.
+def reconstruir(filtro: dict = None, tamanho_lote: int = 5000) -> int:
+    filtro = filtro or {}
+    if set(filtro) - {"username", "cliente", "contrato", "atividade"}:
+        raise ValueError("O filtro só pode usar username, cliente, contrato ou atividade.")
+
+    projecao = {
+        "_id": 0, "data": 1, "username": 1, "cliente": 1, "contrato": 1, "atividade": 1,
+        "tempo_atividade": 1, "tempo_faturado": 1, "tempo_viagem": 1,
+        "distancia_viagem": 1, "valor_euro": 1,
+    }
+
+    linhas = {}
+    for t in tasks_collection.find(filtro, projecao, batch_size=tamanho_lote):
+        k = chave(t)
+        linha = linhas.setdefault(tuple(k[c] for c in CAMPOS_CHAVE), {**k, **dict.fromkeys(totais({}), 0)})
+        for campo, valor in totais(t).items():
+            linha[campo] += valor
+
+    rollup_collection.delete_many(filtro)
+
+    documentos = list(linhas.values())
+    for i in range(0, len(documentos), tamanho_lote):
+        rollup_collection.insert_many(documentos[i:i + tamanho_lote], ordered=False)
+
+    return len(documentos)
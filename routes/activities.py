@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from jose import jwt, JWTError
 from bson import ObjectId
 from db import activities_collection
 from schemas import ActivityBase, ActivityOut
 from config import SECRET_KEY
+import catalogo
+import custos
 
 # Rota principal para atividades (prefixo /activities).
 # Contém endpoints CRUD para criar, consultar, atualizar e eliminar atividades.
@@ -45,6 +47,8 @@ def create_activity(activity: ActivityBase, user: str = Depends(get_current_user
     new_activity = activity.dict()
 
     result = activities_collection.insert_one(new_activity)
+    catalogo.invalidar("activities")
+    custos.invalidar_taxas()
 
     return {"id": str(result.inserted_id), **new_activity}
 
@@ -91,8 +95,10 @@ def get_activity(activity_id: str, user: str = Depends(get_current_user)):
 # Recebe apenas os campos que devem ser atualizados.
 # Se a atividade não existir, retorna 404.
 # Após atualizar, busca novamente o documento e devolve-o com id em formato string.
+# Se o custo_hora mudar, as tarefas da atividade são recalculadas em segundo plano;
+# o id desse job é devolvido no cabeçalho X-Job-Id (progresso em GET /jobs/{id}).
 @router.patch("/{activity_id}", response_model=ActivityOut)
-def update_activity(activity_id: str, updated_data: dict, user: str = Depends(get_current_user)):
+def update_activity(activity_id: str, updated_data: dict, response: Response, user: str = Depends(get_current_user)):
     existing = activities_collection.find_one({"_id": ObjectId(activity_id)})
 
     if not existing:
@@ -105,11 +111,16 @@ def update_activity(activity_id: str, updated_data: dict, user: str = Depends(ge
         {"_id": ObjectId(activity_id)},
         {"$set": updated_data}
     )
+    catalogo.invalidar("activities")
 
     updated = activities_collection.find_one({"_id": ObjectId(activity_id)})
     updated["id"] = str(updated["_id"])
     updated.pop("_id", None)
 
+    custos.invalidar_taxas()
+    if "custo_hora" in updated_data and updated_data["custo_hora"] != existing.get("custo_hora"):
+        response.headers["X-Job-Id"] = custos.recalcular_atividade(updated["atividade"])
+
     return updated
 
 
@@ -121,6 +132,8 @@ def update_activity(activity_id: str, updated_data: dict, user: str = Depends(ge
 @router.delete("/{activity_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_activity(activity_id: str, user: str = Depends(get_current_user)):
     result = activities_collection.delete_one({"_id": ObjectId(activity_id)})
+    catalogo.invalidar("activities")
+    custos.invalidar_taxas()
 
     if result.deleted_count == 0:
         raise HTTPException(
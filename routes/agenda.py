@@ -4,6 +4,7 @@ from bson import ObjectId
 from db import db
 from schemas import AgendaBase, AgendaOut
 from config import SECRET_KEY
+import eventos
 
 # Coleção MongoDB dedicada à agenda (marcação de eventos).
 agenda_collection = db["agenda"]
@@ -50,6 +51,8 @@ def create_agenda(evento: AgendaBase, user: str = Depends(get_current_user)):
 
     result = agenda_collection.insert_one(new_event)
     new_event["id"] = str(result.inserted_id)
+    new_event.pop("_id", None)
+    eventos.publicar("agenda", "created", new_event, new_event.get("utilizador"))
 
     return new_event
 
@@ -114,6 +117,7 @@ def update_agenda(agenda_id: str, updated_data: dict, user: str = Depends(get_cu
     updated = agenda_collection.find_one({"_id": ObjectId(agenda_id)})
     updated["id"] = str(updated["_id"])
     updated.pop("_id", None)
+    eventos.publicar("agenda", "updated", updated, updated.get("utilizador"))
 
     return updated
 
@@ -125,12 +129,14 @@ def update_agenda(agenda_id: str, updated_data: dict, user: str = Depends(get_cu
 # Em caso de sucesso, responde com HTTP 204 (sem conteúdo).
 @router.delete("/{agenda_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_agenda(agenda_id: str, user: str = Depends(get_current_user)):
-    result = agenda_collection.delete_one({"_id": ObjectId(agenda_id)})
+    removido = agenda_collection.find_one_and_delete({"_id": ObjectId(agenda_id)})
 
-    if result.deleted_count == 0:
+    if not removido:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Marcação não encontrada."
         )
 
+    eventos.publicar("agenda", "deleted", removido, removido.get("utilizador"))
+
     return None
@@ -1,3 +1,4 @@
+import threading
 from fastapi import APIRouter, HTTPException
 from msal import ConfidentialClientApplication
 from config import SECRET_KEY, ENTRA_CLIENT_ID, ENTRA_CLIENT_SECRET, ENTRA_TENANT_ID
@@ -24,11 +25,36 @@ AUTHORITY = f"https://login.microsoftonline.com/{ENTRA_TENANT_ID}"
 SCOPES = ["User.Read"]
 
 # Cliente MSAL para gerir autorização OAuth 2.0 com Microsoft Entra.
-app_msal = ConfidentialClientApplication(
-    ENTRA_CLIENT_ID,
-    authority=AUTHORITY,
-    client_credential=ENTRA_CLIENT_SECRET
-)
+# É criado apenas no primeiro pedido: o construtor faz discovery da authority
+# via rede, o que atrasava (ou impedia, sem rede) o arranque do servidor.
+_app_msal = None
+_msal_lock = threading.Lock()
+
+
+def get_msal_app() -> ConfidentialClientApplication:
+    global _app_msal
+
+    if _app_msal is None:
+        with _msal_lock:
+            if _app_msal is None:
+                _app_msal = ConfidentialClientApplication(
+                    ENTRA_CLIENT_ID,
+                    authority=AUTHORITY,
+                    client_credential=ENTRA_CLIENT_SECRET
+                )
+
+    return _app_msal
+
+
+# Liberta a sessão HTTP do cliente MSAL (chamado no shutdown da aplicação).
+def close_msal_app():
+    global _app_msal
+
+    if _app_msal is not None:
+        http_client = getattr(_app_msal, "http_client", None)
+        if hasattr(http_client, "close"):
+            http_client.close()
+        _app_msal = None
 
 
 # --- Iniciar login Microsoft Entra ---
@@ -37,7 +63,7 @@ app_msal = ConfidentialClientApplication(
 # O frontend redireciona o utilizador para este URL.
 @router.get("/entra-login")
 def entra_login():
-    auth_url = app_msal.get_authorization_request_url(
+    auth_url = get_msal_app().get_authorization_request_url(
         SCOPES,
         redirect_uri=REDIRECT_URI
     )
@@ -50,7 +76,7 @@ def entra_login():
 # O código de autorização é trocado por um access_token e id_token (com dados do utilizador).
 @router.get("/entra-callback")
 def entra_callback(code: str):
-    result = app_msal.acquire_token_by_authorization_code(
+    result = get_msal_app().acquire_token_by_authorization_code(
         code,
         scopes=SCOPES,
         redirect_uri=REDIRECT_URI
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from jose import jwt, JWTError
+from config import SECRET_KEY
+import catalogo
+
+# Sugestões para os campos de catálogo das tarefas (prefixo /autocomplete).
+# Evita que o frontend descarregue coleções inteiras só para preencher uma lista.
+router = APIRouter(prefix="/autocomplete", tags=["Autocomplete"])
+
+LIMITE_MAXIMO = 50
+
+
+# --- Autenticação JWT ---
+# Valida o token enviado no cabeçalho Authorization e devolve o username (sub).
+def get_current_user(request: Request):
+    token = request.headers.get("Authorization")
+
+    if not token or not token.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token ausente."
+        )
+
+    token = token.split(" ")[1]
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        return payload.get("sub")
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido."
+        )
+
+
+# --- Sugestões por prefixo ---
+# Endpoint GET /autocomplete/{kind}?q=lis&limit=10
+# kind: clients, contracts, partners, products ou activities.
+# A pesquisa ignora acentos e maiúsculas e também encontra palavras a meio do nome.
+# Devolve [{"id", "nome"}] (nos contratos também "cliente").
+@router.get("/{kind}")
+def autocomplete(
+    kind: str,
+    q: str = Query("", max_length=100),
+    limit: int = Query(10, ge=1, le=LIMITE_MAXIMO),
+    user: str = Depends(get_current_user),
+):
+    try:
+        indice = catalogo.obter(kind)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Catálogo desconhecido. Valores possíveis: {', '.join(catalogo.CATALOGOS)}."
+        )
+
+    return indice.procurar(q, limit)
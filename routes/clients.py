@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from jose import jwt, JWTError
 from bson import ObjectId
 from db import clients_collection
 from schemas import ClientBase, ClientOut
 from config import SECRET_KEY
+from contagens import ModoContagem, definir_total
+from typing import Optional
+import catalogo
+import geo
+import jobs
+import renomeacoes
 
 # Rota principal para clientes (prefixo /clients).
 # Inclui endpoints CRUD para registar, listar, atualizar e eliminar clientes.
@@ -45,7 +51,8 @@ def get_current_user(request: Request):
 def create_client(client: ClientBase, user: str = Depends(get_current_user)):
     new_client = client.dict()
 
-    result = clients_collection.insert_one(new_client)
+    result = clients_collection.insert_one({**new_client, **geo.campos_localizacao(new_client)})
+    catalogo.invalidar("clients")
 
     return {"id": str(result.inserted_id), **new_client}
 
@@ -55,10 +62,17 @@ def create_client(client: ClientBase, user: str = Depends(get_current_user)):
 # Devolve a lista completa de clientes.
 # Para cada documento, converte _id → id e remove o campo _id antes de devolver.
 @router.get("/", response_model=list[ClientOut])
-def list_clients(user: str = Depends(get_current_user)):
+def list_clients(
+    response: Response,
+    count: Optional[str] = ModoContagem,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    user: str = Depends(get_current_user)
+):
     clients = []
+    definir_total(response, clients_collection, None, count)
 
-    for c in clients_collection.find():
+    for c in clients_collection.find().sort("_id", 1).skip(offset).limit(limit or 0):
         c["id"] = str(c["_id"])
         c.pop("_id", None)
         clients.append(c)
@@ -66,6 +80,21 @@ def list_clients(user: str = Depends(get_current_user)):
     return clients
 
 
+# --- Clientes mais próximos ---
+# Endpoint GET /clients/near?lat=38.72&lng=-9.14&raio_km=25&limit=10
+# Devolve os clientes mais próximos do ponto, dentro do raio, do mais próximo para o
+# mais afastado, com a distância em metros (distancia_m). Declarado antes de /{client_id}.
+@router.get("/near", response_model=list[dict])
+def list_clients_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    raio_km: float = Query(25, gt=0, le=geo.RAIO_MAXIMO_KM),
+    limit: int = Query(10, ge=1, le=geo.LIMITE_MAXIMO),
+    user: str = Depends(get_current_user)
+):
+    return geo.proximos(clients_collection, lat, lng, raio_km, limit)
+
+
 # --- Obter cliente por ID ---
 # Endpoint GET /clients/{client_id}
 # Procura um cliente utilizando o ObjectId.
@@ -92,8 +121,10 @@ def get_client(client_id: str, user: str = Depends(get_current_user)):
 # Atualização parcial: apenas os campos enviados são atualizados.
 # Se o cliente não existir, devolve 404.
 # Após atualização, o documento é buscado novamente e devolvido ao cliente.
+# Se o nome mudar, contratos, tarefas, projetos e presets são atualizados em segundo plano;
+# o id desse job é devolvido no cabeçalho X-Job-Id (progresso em GET /jobs/{id}).
 @router.patch("/{client_id}", response_model=ClientOut)
-def update_client(client_id: str, client_data: dict, user: str = Depends(get_current_user)):
+def update_client(client_id: str, client_data: dict, response: Response, user: str = Depends(get_current_user)):
     existing = clients_collection.find_one({"_id": ObjectId(client_id)})
 
     if not existing:
@@ -102,10 +133,37 @@ def update_client(client_id: str, client_data: dict, user: str = Depends(get_cur
             detail="Cliente não encontrado"
         )
 
-    clients_collection.update_one(
-        {"_id": ObjectId(client_id)},
-        {"$set": client_data}
+    # Mudança de nome: reserva a propagação antes de gravar (uma de cada vez por cliente e pelos seus contratos).
+    job_id = None
+    if existing.get("nome") and "nome" in client_data and client_data["nome"] != existing["nome"]:
+        try:
+            job_id = renomeacoes.reservar(
+                "cliente", client_id, {"cliente": existing["nome"]}, {"cliente": client_data["nome"]}
+            )
+        except jobs.JobEmCurso as e:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Já há uma renomeação em curso para este cliente ou um dos seus contratos. Tenta novamente quando terminar.",
+                headers={"X-Job-Id": e.job_id},
+            )
+
+    # Só grava se o nome não mudou desde a leitura.
+    result = clients_collection.update_one(
+        {"_id": ObjectId(client_id), "nome": existing.get("nome")},
+        {"$set": {**client_data, **geo.campos_localizacao(client_data, existing)}}
     )
+    if not result.matched_count:
+        if job_id:
+            jobs.cancelar(job_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O cliente foi alterado entretanto. Tenta novamente."
+        )
+
+    if job_id:
+        jobs.confirmar(job_id)
+        response.headers["X-Job-Id"] = job_id
+    catalogo.invalidar("clients")
 
     updated = clients_collection.find_one({"_id": ObjectId(client_id)})
     updated["id"] = str(updated["_id"])
@@ -122,6 +180,7 @@ def update_client(client_id: str, client_data: dict, user: str = Depends(get_cur
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_client(client_id: str, user: str = Depends(get_current_user)):
     result = clients_collection.delete_one({"_id": ObjectId(client_id)})
+    catalogo.invalidar("clients")
 
     if result.deleted_count == 0:
         raise HTTPException(
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from typing import Optional
 from jose import jwt, JWTError
 from bson import ObjectId
 from db import db
-from schemas import ContractBase, ContractOut
+from schemas import ContractBase, ContractOut, ContractRollupOut
 from config import SECRET_KEY
+from pipelines import minutos_expr
+import catalogo
+import jobs
+import renomeacoes
 
 # Coleção MongoDB onde os contratos são armazenados
 contracts_collection = db["contracts"]
+tasks_collection = db["tasks"]
 
 # Rota principal para gestão de contratos (prefixo /contracts)
 # Inclui endpoints CRUD para criar, listar, obter, atualizar e eliminar contratos.
@@ -40,6 +46,101 @@ def get_current_user(request: Request):
         )
 
 
+# --- Rollup financeiro dos contratos ---
+# Pipeline sobre as tarefas: horas faturadas por (cliente, contrato, atividade),
+# custo_hora da atividade via $lookup, total por contrato e, por fim,
+# o valor do contrato via $lookup em contracts. Tudo calculado no servidor.
+def pipeline_rollup_contratos(filtro_tarefas: dict) -> list:
+    return [
+        {"$match": filtro_tarefas},
+        {"$group": {
+            "_id": {"cliente": "$cliente", "contrato": "$contrato", "atividade": "$atividade"},
+            "minutos": {"$sum": minutos_expr("$tempo_faturado")},
+        }},
+        {"$lookup": {
+            "from": "activities",
+            "localField": "_id.atividade",
+            "foreignField": "atividade",
+            "as": "atividade_doc",
+        }},
+        {"$addFields": {
+            "horas": {"$divide": ["$minutos", 60]},
+            "custo_hora": {"$ifNull": [{"$arrayElemAt": ["$atividade_doc.custo_hora", 0]}, 0]},
+        }},
+        {"$addFields": {"custo": {"$multiply": ["$horas", "$custo_hora"]}}},
+        {"$group": {
+            "_id": {"cliente": "$_id.cliente", "contrato": "$_id.contrato"},
+            "horas": {"$sum": "$horas"},
+            "custo": {"$sum": "$custo"},
+            "por_atividade": {"$push": {
+                "atividade": "$_id.atividade",
+                "horas": {"$round": ["$horas", 2]},
+                "custo_hora": "$custo_hora",
+                "custo": {"$round": ["$custo", 2]},
+            }},
+        }},
+        {"$lookup": {
+            "from": "contracts",
+            "localField": "_id.contrato",
+            "foreignField": "contrato",
+            "as": "contratos",
+        }},
+        # Nomes de contrato podem repetir-se entre clientes: fica apenas o do mesmo cliente.
+        {"$addFields": {"contrato_doc": {"$arrayElemAt": [
+            {"$filter": {
+                "input": "$contratos",
+                "cond": {"$eq": ["$$this.cliente", "$_id.cliente"]},
+            }},
+            0,
+        ]}}},
+        {"$match": {"contrato_doc": {"$ne": None}}},
+        {"$project": {
+            "_id": 0,
+            "id": {"$toString": "$contrato_doc._id"},
+            "contrato": "$_id.contrato",
+            "cliente": "$_id.cliente",
+            "estado": "$contrato_doc.estado",
+            "valor_euro": "$contrato_doc.valor_euro",
+            "horas": {"$round": ["$horas", 2]},
+            "custo": {"$round": ["$custo", 2]},
+            "saldo": {"$round": [{"$subtract": ["$contrato_doc.valor_euro", "$custo"]}, 2]},
+            "consumo_pct": {"$cond": [
+                {"$gt": [{"$ifNull": ["$contrato_doc.valor_euro", 0]}, 0]},
+                {"$round": [{"$multiply": [{"$divide": ["$custo", "$contrato_doc.valor_euro"]}, 100]}, 1]},
+                None,
+            ]},
+            "por_atividade": 1,
+        }},
+        {"$sort": {"cliente": 1, "contrato": 1}},
+    ]
+
+
+# Contratos sem tarefas não aparecem na agregação; ficam com consumo zero.
+def rollup_vazio(contract: dict) -> dict:
+    return {
+        "id": str(contract["_id"]),
+        "contrato": contract["contrato"],
+        "cliente": contract["cliente"],
+        "estado": contract.get("estado"),
+        "valor_euro": contract.get("valor_euro"),
+        "saldo": contract.get("valor_euro"),
+        "consumo_pct": 0.0 if contract.get("valor_euro") else None,
+    }
+
+
+# --- Rollup financeiro de todos os contratos ---
+# Endpoint GET /contracts/rollup
+# Custo consumido (horas faturadas x custo_hora) face ao valor de cada contrato.
+# Opcionalmente filtrado por cliente.
+@router.get("/rollup", response_model=list[ContractRollupOut])
+def list_contracts_rollup(cliente: Optional[str] = None, user: str = Depends(get_current_user)):
+    filtro = {"contrato": {"$nin": [None, ""]}}
+    if cliente:
+        filtro["cliente"] = cliente
+
+    return list(tasks_collection.aggregate(pipeline_rollup_contratos(filtro)))
+
+
 # --- Criar contrato ---
 # Endpoint POST /contracts/
 # Recebe um ContractBase, guarda na base de dados e devolve o contrato criado.
@@ -49,6 +150,7 @@ def create_contract(contract: ContractBase, user: str = Depends(get_current_user
     new_contract = contract.dict()
 
     result = contracts_collection.insert_one(new_contract)
+    catalogo.invalidar("contracts")
 
     return {"id": str(result.inserted_id), **new_contract}
 
@@ -90,13 +192,33 @@ def get_contract(contract_id: str, user: str = Depends(get_current_user)):
     return contract
 
 
+# --- Rollup financeiro de um contrato ---
+# Endpoint GET /contracts/{contract_id}/rollup
+@router.get("/{contract_id}/rollup", response_model=ContractRollupOut)
+def get_contract_rollup(contract_id: str, user: str = Depends(get_current_user)):
+    contract = contracts_collection.find_one({"_id": ObjectId(contract_id)})
+
+    if not contract:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Contrato não encontrado."
+        )
+
+    filtro = {"cliente": contract["cliente"], "contrato": contract["contrato"]}
+    resultado = next(tasks_collection.aggregate(pipeline_rollup_contratos(filtro)), None)
+
+    return resultado or rollup_vazio(contract)
+
+
 # --- Atualizar contrato ---
 # Endpoint PATCH /contracts/{contract_id}
 # Permite atualização parcial: apenas os campos enviados são modificados.
 # Se o contrato não existir, devolve 404.
 # Após atualização, devolve o documento atualizado.
+# Se o nome do contrato ou o cliente mudarem, tarefas, projetos e presets são atualizados
+# em segundo plano; o id desse job é devolvido no cabeçalho X-Job-Id.
 @router.patch("/{contract_id}", response_model=ContractOut)
-def update_contract(contract_id: str, updated_data: dict, user: str = Depends(get_current_user)):
+def update_contract(contract_id: str, updated_data: dict, response: Response, user: str = Depends(get_current_user)):
     existing = contracts_collection.find_one({"_id": ObjectId(contract_id)})
 
     if not existing:
@@ -105,10 +227,37 @@ def update_contract(contract_id: str, updated_data: dict, user: str = Depends(ge
             detail="Contrato não encontrado."
         )
 
-    contracts_collection.update_one(
-        {"_id": ObjectId(contract_id)},
+    # Mudança de cliente/contrato: reserva a propagação antes de gravar (uma de cada vez por contrato e pelo seu cliente).
+    de = {"cliente": existing.get("cliente"), "contrato": existing.get("contrato")}
+    para = {campo: updated_data.get(campo, valor) for campo, valor in de.items()}
+    job_id = None
+    if de["contrato"] and de != para:
+        try:
+            job_id = renomeacoes.reservar("contrato", contract_id, de, para)
+        except jobs.JobEmCurso as e:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Já há uma renomeação em curso para este contrato ou o seu cliente. Tenta novamente quando terminar.",
+                headers={"X-Job-Id": e.job_id},
+            )
+
+    # Só grava se o cliente e o contrato não mudaram desde a leitura.
+    result = contracts_collection.update_one(
+        {"_id": ObjectId(contract_id), **de},
         {"$set": updated_data}
     )
+    if not result.matched_count:
+        if job_id:
+            jobs.cancelar(job_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O contrato foi alterado entretanto. Tenta novamente."
+        )
+
+    if job_id:
+        jobs.confirmar(job_id)
+        response.headers["X-Job-Id"] = job_id
+    catalogo.invalidar("contracts")
 
     updated = contracts_collection.find_one({"_id": ObjectId(contract_id)})
     updated["id"] = str(updated["_id"])
@@ -125,6 +274,7 @@ def update_contract(contract_id: str, updated_data: dict, user: str = Depends(ge
 @router.delete("/{contract_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_contract(contract_id: str, user: str = Depends(get_current_user)):
     result = contracts_collection.delete_one({"_id": ObjectId(contract_id)})
+    catalogo.invalidar("contracts")
 
     if result.deleted_count == 0:
         raise HTTPException(
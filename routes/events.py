@@ -0,0 +1,90 @@
+import asyncio
+import time
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from jose import jwt, JWTError
+from config import SECRET_KEY
+import eventos
+
+# Eventos em tempo real (Server-Sent Events) sobre tarefas e agenda (prefixo /events).
+router = APIRouter(prefix="/events", tags=["Eventos"])
+
+# Comentário enviado periodicamente para manter a ligação aberta em proxies.
+INTERVALO_PING = 15
+
+# As ligações são renovadas periodicamente (o EventSource volta a ligar sozinho).
+DURACAO_MAXIMA = 30 * 60
+
+
+# --- Autenticação JWT ---
+# O EventSource do browser não envia cabeçalhos, por isso o token também é aceite
+# no parâmetro ?token=. Devolve (username, role).
+def get_current_user_full(request: Request):
+    token = request.headers.get("Authorization")
+
+    if token and token.startswith("Bearer "):
+        token = token.split(" ")[1]
+    else:
+        token = request.query_params.get("token")
+
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token ausente."
+        )
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido."
+        )
+
+    username = payload.get("sub")
+    if not username:
+        raise HTTPException(status_code=401, detail="Token sem utilizador válido.")
+
+    return username, payload.get("role", "user")
+
+
+# --- Stream de eventos ---
+# Endpoint GET /events/stream
+# Eventos "task.created|updated|deleted" e "agenda.created|updated|deleted" (data = JSON).
+# Um utilizador só recebe as suas tarefas; administradores recebem todas.
+# Após "sistema.resync" (cliente atrasado) ou ao voltar a ligar, o cliente deve
+# recuperar o estado com GET /tasks/changes e GET /agenda/.
+@router.get("/stream")
+async def stream_events(request: Request):
+    username, role = get_current_user_full(request)
+    sub = eventos.difusor.subscrever(username, role)
+
+    async def gerar():
+        fim = time.monotonic() + DURACAO_MAXIMA
+        try:
+            yield "retry: 3000\n\n"
+
+            while time.monotonic() < fim:
+                try:
+                    evento = await asyncio.wait_for(sub.fila.get(), timeout=INTERVALO_PING)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+
+                if evento is None:
+                    break
+
+                yield eventos.formatar_sse(evento)
+
+                if evento["tipo"] == "sistema":
+                    break
+        finally:
+            eventos.difusor.cancelar(sub)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from jose import jwt, JWTError
+from bson.errors import InvalidId
+from config import SECRET_KEY
+import jobs
+
+# Rota para acompanhar jobs de manutenção em lote (prefixo /jobs).
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+# --- Autenticação JWT ---
+# Valida o token enviado no cabeçalho Authorization e devolve o username (sub).
+def get_current_user(request: Request):
+    token = request.headers.get("Authorization")
+
+    if not token or not token.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token ausente."
+        )
+
+    token = token.split(" ")[1]
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        return payload.get("sub")
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido."
+        )
+
+
+# --- Estado de um job ---
+# Endpoint GET /jobs/{job_id}
+# Devolve tipo, parâmetros, estado (pendente/em_curso/concluido/erro) e progresso.
+@router.get("/{job_id}")
+def get_job(job_id: str, user: str = Depends(get_current_user)):
+    try:
+        job = jobs.obter(job_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="ID inválido.")
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado."
+        )
+
+    return job
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from jose import jwt, JWTError
 from bson import ObjectId
 from db import db
 from schemas import ParceiroBase, ParceiroOut
 from config import SECRET_KEY
+import catalogo
+import geo
 
 # Coleção onde os parceiros são armazenados
 partners_collection = db["partners"]
@@ -42,7 +44,8 @@ def get_current_user(request: Request):
 @router.post("/", response_model=ParceiroOut, status_code=status.HTTP_201_CREATED)
 def create_parceiro(parceiro: ParceiroBase, user: str = Depends(get_current_user)):
     new_parceiro = parceiro.dict()
-    result = partners_collection.insert_one(new_parceiro)
+    result = partners_collection.insert_one({**new_parceiro, **geo.campos_localizacao(new_parceiro)})
+    catalogo.invalidar("partners")
     return {"id": str(result.inserted_id), **new_parceiro}
 
 
@@ -61,6 +64,20 @@ def list_partners(user: str = Depends(get_current_user)):
     return partners
 
 
+# --- Parceiros mais próximos ---
+# Endpoint GET /partners/near?lat=38.72&lng=-9.14&raio_km=25&limit=10
+# Igual a GET /clients/near; declarado antes de /{parceiro_id}.
+@router.get("/near", response_model=list[dict])
+def list_partners_near(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    raio_km: float = Query(25, gt=0, le=geo.RAIO_MAXIMO_KM),
+    limit: int = Query(10, ge=1, le=geo.LIMITE_MAXIMO),
+    user: str = Depends(get_current_user)
+):
+    return geo.proximos(partners_collection, lat, lng, raio_km, limit)
+
+
 # --- Obter parceiro ---
 # Obtém os dados de um parceiro através do seu identificador.
 @router.get("/{parceiro_id}", response_model=ParceiroOut)
@@ -94,8 +111,9 @@ def update_parceiro(parceiro_id: str, updated_data: dict, user: str = Depends(ge
 
     partners_collection.update_one(
         {"_id": ObjectId(parceiro_id)},
-        {"$set": updated_data}
+        {"$set": {**updated_data, **geo.campos_localizacao(updated_data, existing)}}
     )
+    catalogo.invalidar("partners")
 
     updated = partners_collection.find_one({"_id": ObjectId(parceiro_id)})
     updated["id"] = str(updated["_id"])
@@ -109,6 +127,7 @@ def update_parceiro(parceiro_id: str, updated_data: dict, user: str = Depends(ge
 @router.delete("/{parceiro_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_parceiro(parceiro_id: str, user: str = Depends(get_current_user)):
     result = partners_collection.delete_one({"_id": ObjectId(parceiro_id)})
+    catalogo.invalidar("partners")
 
     if result.deleted_count == 0:
         raise HTTPException(
@@ -4,6 +4,7 @@ from bson import ObjectId
 from db import db
 from schemas import ProductBase, ProductOut
 from config import SECRET_KEY
+import catalogo
 
 # Coleção onde os produtos são armazenados
 products_collection = db["products"]
@@ -45,6 +46,7 @@ def create_product(product: ProductBase, user: str = Depends(get_current_user)):
     new_product = product.dict()
 
     result = products_collection.insert_one(new_product)
+    catalogo.invalidar("products")
 
     return {"id": str(result.inserted_id), **new_product}
 
@@ -100,6 +102,7 @@ def update_product(product_id: str, updated_data: dict, user: str = Depends(get_
         {"_id": ObjectId(product_id)},
         {"$set": updated_data}
     )
+    catalogo.invalidar("products")
 
     updated = products_collection.find_one({"_id": ObjectId(product_id)})
     updated["id"] = str(updated["_id"])
@@ -113,6 +116,7 @@ def update_product(product_id: str, updated_data: dict, user: str = Depends(get_
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_product(product_id: str, user: str = Depends(get_current_user)):
     result = products_collection.delete_one({"_id": ObjectId(product_id)})
+    catalogo.invalidar("products")
 
     if result.deleted_count == 0:
         raise HTTPException(
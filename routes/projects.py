@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from jose import jwt, JWTError
 from bson import ObjectId
+from pymongo import UpdateOne
 from db import db
-from schemas import ProjectBase, ProjectOut
-from config import SECRET_KEY
+from schemas import ProjectBase, ProjectOut, ProjectHoursOut, ProjectBreakdownOut
+from config import SECRET_KEY, COALESCE_TTL
+from pipelines import minutos_expr, mes_expr
+from cache import CacheLocal, Coalescedor, chave_pedido, versao
 
 # Rotas relacionadas com gestão de projetos
 router = APIRouter(prefix="/projects", tags=["Projetos"])
@@ -12,6 +15,9 @@ router = APIRouter(prefix="/projects", tags=["Projetos"])
 projects_collection = db["projects"]
 tasks_collection = db["tasks"]
 
+# Pedidos simultâneos da lista de projetos partilham a mesma consulta.
+lista_coalescedor = Coalescedor(ttl=COALESCE_TTL)
+
 
 # --- Autenticação JWT ---
 # Extrai e valida o token JWT enviado no cabeçalho Authorization.
@@ -61,6 +67,92 @@ def calcular_horas_gastas(cliente: str, contrato: str) -> float:
     return round(total, 2)
 
 
+# --- Cache da decomposição de horas ---
+# Cada entrada fica válida até mudar uma tarefa do mesmo cliente/contrato
+# (ver registar_alteracao em routes/tasks.py, que incrementa esta versão).
+breakdown_cache = CacheLocal(ttl=3600, max_entradas=512)
+
+
+def chave_versao_projeto(cliente: str, contrato: str) -> str:
+    return f"projeto:{cliente}|{contrato}"
+
+
+# --- Decomposição de horas de um cliente/contrato ---
+# Uma única agregação com $facet: horas por utilizador, por atividade e por mês.
+def calcular_decomposicao(cliente: str, contrato: str) -> dict:
+    def agrupar(campo: str, ordem: dict) -> list:
+        return [
+            {"$group": {"_id": campo, "minutos": {"$sum": "$minutos"}, "tarefas": {"$sum": 1}}},
+            {"$sort": ordem},
+        ]
+
+    pipeline = [
+        {"$match": {"cliente": cliente, "contrato": contrato}},
+        {"$project": {
+            "username": 1,
+            "atividade": 1,
+            "minutos": minutos_expr("$tempo_faturado"),
+            "mes": mes_expr("$data"),
+        }},
+        {"$facet": {
+            "por_utilizador": agrupar("$username", {"minutos": -1}),
+            "por_atividade": agrupar("$atividade", {"minutos": -1}),
+            "por_mes": agrupar("$mes", {"_id": 1}),
+        }},
+    ]
+
+    resultado = next(tasks_collection.aggregate(pipeline), {})
+
+    decomposicao = {}
+    for faceta in ("por_utilizador", "por_atividade", "por_mes"):
+        decomposicao[faceta] = [
+            {"chave": g["_id"], "horas": round(g["minutos"] / 60, 2), "tarefas": g["tarefas"]}
+            for g in resultado.get(faceta, [])
+        ]
+
+    decomposicao["horas_gastas"] = round(sum(g["horas"] for g in decomposicao["por_utilizador"]), 2)
+    return decomposicao
+
+
+# --- Recalcular horas de todos os projetos ---
+# Soma o tempo faturado por (cliente, contrato) numa única agregação sobre as tarefas
+# e grava o resultado em todos os projetos com um único bulk_write.
+def recalcular_todos_projetos() -> list:
+    projetos = list(projects_collection.find())
+    if not projetos:
+        return []
+
+    clientes = list({p["cliente"] for p in projetos})
+    pipeline = [
+        {"$match": {"cliente": {"$in": clientes}}},
+        {"$group": {
+            "_id": {"cliente": "$cliente", "contrato": "$contrato"},
+            "minutos": {"$sum": minutos_expr("$tempo_faturado")},
+        }},
+    ]
+
+    minutos_por_par = {
+        (r["_id"]["cliente"], r["_id"]["contrato"]): r["minutos"]
+        for r in tasks_collection.aggregate(pipeline)
+    }
+
+    operacoes = []
+    resultado = []
+    for p in projetos:
+        horas = round(minutos_por_par.get((p["cliente"], p["contrato"]), 0) / 60, 2)
+        operacoes.append(UpdateOne({"_id": p["_id"]}, {"$set": {"horas_gastas": horas}}))
+
+        p["horas_gastas"] = horas
+        p["horas_restantes"] = round((p.get("horas_contratadas") or 0) - horas, 2)
+        p["id"] = str(p.pop("_id"))
+        resultado.append(p)
+
+    projects_collection.bulk_write(operacoes, ordered=False)
+    lista_coalescedor.invalidar()
+
+    return resultado
+
+
 # --- Criar projeto ---
 # Regista um novo projeto associado a um cliente e contrato.
 # Calcula automaticamente as horas já gastas com base nas tarefas existentes.
@@ -84,14 +176,28 @@ def create_project(project: ProjectBase, user: str = Depends(get_current_user)):
     new_project["horas_gastas"] = horas_gastas
 
     result = projects_collection.insert_one(new_project)
+    lista_coalescedor.invalidar()
 
     return {"id": str(result.inserted_id), **new_project}
 
 
+# --- Recalcular horas (todos os projetos) ---
+# Atualiza horas_gastas de todos os projetos de uma vez
+# e devolve também as horas restantes face às horas contratadas.
+@router.post("/recompute", response_model=list[ProjectHoursOut])
+def recompute_projects(user: str = Depends(get_current_user)):
+    return recalcular_todos_projetos()
+
+
 # --- Listar todos os projetos ---
 # Devolve a lista completa de projetos armazenados na coleção.
 @router.get("/", response_model=list[ProjectOut])
-def list_projects(user: str = Depends(get_current_user)):
+def list_projects(request: Request, user: str = Depends(get_current_user)):
+    # A lista é igual para qualquer utilizador autenticado: pedidos simultâneos partilham a consulta.
+    return lista_coalescedor.executar(chave_pedido(request), listar_projetos)
+
+
+def listar_projetos() -> list:
     projects = []
 
     for p in projects_collection.find():
@@ -120,6 +226,31 @@ def get_project(project_id: str, user: str = Depends(get_current_user)):
     return project
 
 
+# --- Decomposição de horas do projeto ---
+# Horas gastas por utilizador, atividade e mês para o cliente/contrato do projeto.
+@router.get("/{project_id}/breakdown", response_model=ProjectBreakdownOut)
+def get_project_breakdown(project_id: str, user: str = Depends(get_current_user)):
+    project = projects_collection.find_one({"_id": ObjectId(project_id)})
+
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Projeto não encontrado."
+        )
+
+    cliente = project["cliente"]
+    contrato = project["contrato"]
+    chave = chave_versao_projeto(cliente, contrato)
+
+    decomposicao = breakdown_cache.obter_ou_calcular(
+        chave,
+        lambda: calcular_decomposicao(cliente, contrato),
+        versao=versao(chave),
+    )
+
+    return {"id": str(project["_id"]), "cliente": cliente, "contrato": contrato, **decomposicao}
+
+
 # --- Atualizar projeto ---
 # Permite modificar parcialmente os dados de um projeto.
 # Apenas os campos enviados serão alterados.
@@ -137,6 +268,7 @@ def update_project(project_id: str, updated_data: dict, user: str = Depends(get_
         {"_id": ObjectId(project_id)},
         {"$set": updated_data}
     )
+    lista_coalescedor.invalidar()
 
     updated = projects_collection.find_one({"_id": ObjectId(project_id)})
     updated["id"] = str(updated["_id"])
@@ -167,6 +299,7 @@ def update_project_hours(project_id: str, user: str = Depends(get_current_user))
         {"_id": ObjectId(project_id)},
         {"$set": {"horas_gastas": novas_horas}}
     )
+    lista_coalescedor.invalidar()
 
     project["horas_gastas"] = novas_horas
     project["id"] = str(project["_id"])
@@ -180,6 +313,7 @@ def update_project_hours(project_id: str, user: str = Depends(get_current_user))
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_project(project_id: str, user: str = Depends(get_current_user)):
     result = projects_collection.delete_one({"_id": ObjectId(project_id)})
+    lista_coalescedor.invalidar()
 
     if result.deleted_count == 0:
         raise HTTPException(
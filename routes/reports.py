@@ -0,0 +1,121 @@
+import asyncio
+import json
+import time
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from jose import jwt, JWTError
+from bson.errors import InvalidId
+from config import SECRET_KEY
+from schemas import ReportRequest
+import relatorios
+
+# Relatórios pesados gerados em segundo plano (prefixo /reports).
+# Fluxo: POST /reports → id; GET /reports/{id}?wait=N até estar concluído; GET /reports/{id}/result.
+router = APIRouter(prefix="/reports", tags=["Relatórios"])
+
+# Limite da espera em long-poll e intervalo entre verificações (segundos).
+ESPERA_MAXIMA = 30
+INTERVALO_POLL = 0.5
+
+
+# --- Autenticação de administrador ---
+# Valida o JWT e exige o papel "admin".
+def get_current_admin(request: Request):
+    token = request.headers.get("Authorization")
+
+    if not token or not token.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token ausente."
+        )
+
+    token = token.split(" ")[1]
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido."
+        )
+
+    if payload.get("role", "user") != "admin":
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+
+    return payload.get("sub")
+
+
+def obter_relatorio(report_id: str) -> dict:
+    try:
+        job = relatorios.obter(report_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="ID inválido.")
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Relatório não encontrado ou expirado."
+        )
+
+    return job
+
+
+# --- Pedir relatório ---
+# Endpoint POST /reports  {"tipo": "tarefas"} ou {"tipo": "atividade", "mes": 3}
+# Devolve logo o estado do relatório (202); um pedido igual ainda válido reaproveita o existente,
+# exceto com "refresh": true, que gera um novo a partir dos dados atuais.
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+def create_report(pedido: ReportRequest, user: str = Depends(get_current_admin)):
+    try:
+        params = relatorios.normalizar_params(pedido.tipo, pedido.mes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        return relatorios.pedir(pedido.tipo, params, user, refrescar=pedido.refresh)
+    except relatorios.LimiteExcedido:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados relatórios em preparação. Tenta novamente dentro de instantes.",
+            headers={"Retry-After": "10"},
+        )
+
+
+# --- Estado do relatório ---
+# Endpoint GET /reports/{report_id}?wait=N
+# Com wait > 0 a resposta só chega quando o relatório terminar ou ao fim de N segundos (long-poll).
+@router.get("/{report_id}")
+async def get_report(
+    report_id: str,
+    wait: float = Query(0, ge=0, le=ESPERA_MAXIMA),
+    user: str = Depends(get_current_admin),
+):
+    limite = time.monotonic() + wait
+
+    while True:
+        job = await to_thread.run_sync(obter_relatorio, report_id)
+        if job["estado"] in ("concluido", "erro") or time.monotonic() >= limite:
+            return job
+        await asyncio.sleep(min(INTERVALO_POLL, max(0.0, limite - time.monotonic())))
+
+
+# --- Resultado do relatório ---
+# Endpoint GET /reports/{report_id}/result
+# Envia as linhas em streaming como um array JSON (o mesmo formato dos endpoints síncronos).
+@router.get("/{report_id}/result")
+def get_report_result(report_id: str, user: str = Depends(get_current_admin)):
+    job = obter_relatorio(report_id)
+
+    if job["estado"] == "erro":
+        raise HTTPException(status_code=500, detail=f"O relatório falhou: {job.get('erro')}")
+    if job["estado"] != "concluido":
+        raise HTTPException(status_code=409, detail="O relatório ainda não está concluído.")
+
+    def gerar():
+        yield "["
+        for i, linha in enumerate(relatorios.linhas(report_id)):
+            yield ("," if i else "") + json.dumps(linha, default=str, ensure_ascii=False)
+        yield "]"
+
+    return StreamingResponse(gerar(), media_type="application/json")
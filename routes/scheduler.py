@@ -0,0 +1,43 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from jose import jwt, JWTError
+from config import SECRET_KEY
+from scheduler import agendador
+
+# Rota de observação do agendador de tarefas periódicas (prefixo /scheduler).
+router = APIRouter(prefix="/scheduler", tags=["Agendador"])
+
+
+# --- Autenticação de administrador ---
+# Valida o JWT e exige o papel "admin".
+def get_current_admin(request: Request):
+    token = request.headers.get("Authorization")
+
+    if not token or not token.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token ausente."
+        )
+
+    token = token.split(" ")[1]
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido."
+        )
+
+    if payload.get("role", "user") != "admin":
+        raise HTTPException(status_code=403, detail="Acesso negado.")
+
+    return payload.get("sub")
+
+
+# --- Métricas dos jobs agendados ---
+# Endpoint GET /scheduler/jobs
+# As métricas são do worker que responde (identificado pelo pid).
+@router.get("/jobs")
+def list_scheduled_jobs(user: str = Depends(get_current_admin)):
+    return {"worker": agendador.dono or f"pid {os.getpid()}", "jobs": agendador.metricas()}
@@ -1,14 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import JSONResponse
+from anyio import to_thread
 from jose import jwt, JWTError
 from bson import ObjectId
+from pymongo import ReturnDocument
 from db import tasks_collection, users_collection
 from db import db
-from schemas import TaskBase, TaskOut
-from config import SECRET_KEY
-from datetime import datetime
+from schemas import TaskBase, TaskOut, TaskUpdate
+from config import (
+    SECRET_KEY, COALESCE_TTL, TASK_WRITE_BUFFER,
+    TASK_BUFFER_MAX_DOCS, TASK_BUFFER_INTERVAL_MS, TASK_BUFFER_CAPACITY
+)
+from conversoes import data_iso
+from cache import CacheLocal, Coalescedor, chave_pedido, incrementar_versoes, versao
+from buffer_escrita import BufferEscrita, BufferCheio
+from contagens import ModoContagem, definir_total
+from consultas import listar_todas_tarefas, atividade_mensal
+from routes.projects import chave_versao_projeto
+import catalogo
+import custos
+import eventos
+import idempotencia
+import rollup
+import sincronizacao
 from dotenv import load_dotenv
 import os
 from typing import Optional
+import traceback
 
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
@@ -16,6 +34,9 @@ API_KEY = os.getenv("API_KEY")
 tasks_collection = db["tasks"]
 router = APIRouter(prefix="/tasks", tags=["Tarefas"])
 
+# Consultas de administração pesadas: pedidos iguais em simultâneo partilham o mesmo cálculo.
+admin_coalescedor = Coalescedor(ttl=COALESCE_TTL)
+
 
 # --- Autenticação completa (username + role) ---
 # Obtém tanto o utilizador autenticado como o papel associado (user/admin).
@@ -73,10 +94,160 @@ def get_current_user(request: Request) -> str:
         raise HTTPException(status_code=401, detail="Token inválido.")
 
 
+# --- Construção de filtros para a listagem ---
+# Converte os parâmetros opcionais da query num filtro MongoDB.
+# Texto → regex sem distinção de maiúsculas; números → igualdade.
+# Parâmetros de intervalo e listas usam operadores que aproveitam os índices:
+#   data_de / data_ate   → data_iso ($gte / $lte, datas em qualquer formato aceite)
+#   valor_min / valor_max → valor_euro ($gte / $lte)
+#   clientes              → cliente $in (lista ou texto separado por vírgulas)
+# Condições sobre o mesmo campo (ex.: cliente e clientes) têm de se verificar todas ($and).
+INTERVALOS = {
+    "data_de": ("data_iso", "$gte"),
+    "data_ate": ("data_iso", "$lte"),
+    "valor_min": ("valor_euro", "$gte"),
+    "valor_max": ("valor_euro", "$lte"),
+}
+
+# Ordenações permitidas em ?sort= (prefixo "-" para descendente) → campo no Mongo.
+ORDENACOES = {
+    "data": "data_iso",
+    "valor_euro": "valor_euro",
+    "cliente": "cliente",
+    "contrato": "contrato",
+    "atividade": "atividade",
+    "updated_at": "updated_at",
+}
+
+
+def construir_filtro(parametros: dict, filtro: Optional[dict] = None) -> dict:
+    filtro = dict(filtro or {})
+    intervalos = {}
+
+    for campo, valor in parametros.items():
+        if valor is None:
+            continue
+
+        if campo in INTERVALOS:
+            destino, operador = INTERVALOS[campo]
+            if destino == "data_iso":
+                valor = data_iso(valor)
+                if valor is None:
+                    raise HTTPException(status_code=400, detail=f"Data inválida em {campo}.")
+            intervalos.setdefault(destino, {})[operador] = valor
+
+        elif campo == "clientes":
+            valores = [c.strip() for v in valor for c in v.split(",") if c.strip()]
+            if valores:
+                _juntar(filtro, "cliente", {"$in": valores})
+
+        else:
+            _juntar(filtro, campo, {"$regex": valor, "$options": "i"} if isinstance(valor, str) else valor)
+
+    for destino, condicao in intervalos.items():
+        _juntar(filtro, destino, condicao)
+
+    return filtro
+
+
+# Acrescenta a condição ao filtro sem substituir a que o campo já tenha.
+def _juntar(filtro: dict, campo: str, condicao):
+    if campo in filtro:
+        filtro.setdefault("$and", []).append({campo: condicao})
+    else:
+        filtro[campo] = condicao
+
+
+# Converte ?sort= numa lista para .sort(); sem parâmetro mantém a ordem por data descendente.
+def construir_ordenacao(sort: Optional[str]) -> list:
+    if not sort:
+        return [("data", -1)]
+
+    campo = sort.lstrip("-")
+    if campo not in ORDENACOES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Ordenação inválida. Usa um de: {', '.join(ORDENACOES)} (prefixo '-' para descendente)."
+        )
+
+    return [(ORDENACOES[campo], -1 if sort.startswith("-") else 1), ("_id", -1)]
+
+
+# --- Efeitos de uma escrita de tarefa ---
+# Mantém os dados derivados coerentes depois de criar (antes=None),
+# atualizar ou eliminar (depois=None) uma tarefa:
+# rollup diário, versões das caches que dependem das tarefas e evento em tempo real.
+def registar_alteracao(antes: Optional[dict], depois: Optional[dict]):
+    registar_alteracoes([(antes, depois)])
+
+
+# O mesmo para várias escritas de uma vez (ex.: um lote do buffer de escrita).
+def registar_alteracoes(pares: list):
+    alteracoes = [(t, sinal) for antes, depois in pares for t, sinal in ((antes, -1), (depois, 1)) if t]
+
+    rollup.aplicar(alteracoes)
+    incrementar_versoes(
+        [chave_versao_projeto(t.get("cliente"), t.get("contrato")) for t, _ in alteracoes]
+        + [chave_versao_tarefas(t.get("username")) for t, _ in alteracoes]
+    )
+    admin_coalescedor.invalidar()
+
+    for antes, depois in pares:
+        acao = "created" if antes is None else "deleted" if depois is None else "updated"
+        tarefa = depois or antes
+        eventos.publicar("task", acao, tarefa, tarefa.get("username"))
+
+
+# --- Referências ao catálogo ---
+# cliente, contrato, parceiro, produto e atividade têm de existir nos catálogos
+# (validação em memória, ver catalogo.py). Os nomes são guardados na forma do catálogo.
+# O contrato só é confrontado com o cliente quando ambos vêm no pedido.
+def validar_referencias(dados: dict):
+    erros = catalogo.validar(dados)
+    if erros:
+        raise HTTPException(
+            status_code=422,
+            detail={"mensagem": "Referências inválidas na tarefa.", "erros": erros},
+        )
+
+
+# Insere uma tarefa já preparada e devolve-a no formato da API.
+# Depois do insert a tarefa está gravada: uma falha nos efeitos (rollup, versões,
+# eventos) é registada mas não faz falhar o pedido, tal como no buffer de escrita,
+# para que um Idempotency-Key não seja libertado e a repetição não a duplique.
+def inserir_tarefa(new_task: dict) -> dict:
+    tasks_collection.insert_one(new_task)
+    created_task = formatar_tarefa(new_task)
+    try:
+        registar_alteracao(None, created_task)
+    except Exception:
+        traceback.print_exc()
+    return created_task
+
+
+def formatar_tarefa(task: dict) -> dict:
+    task = dict(task)
+    task["id"] = str(task.pop("_id"))
+    return task
+
+
+# --- Buffer de escrita (opcional, TASK_WRITE_BUFFER=1) ---
+# As tarefas criadas via x-api-key são gravadas em lote (insert_many) e os efeitos
+# (rollup, versões, eventos) aplicados uma vez por lote. Ver buffer_escrita.py.
+buffer_tarefas = BufferEscrita(
+    tasks_collection,
+    max_documentos=TASK_BUFFER_MAX_DOCS,
+    intervalo_ms=TASK_BUFFER_INTERVAL_MS,
+    capacidade=TASK_BUFFER_CAPACITY,
+    ao_inserir=lambda docs: registar_alteracoes([(None, formatar_tarefa(d)) for d in docs]),
+) if TASK_WRITE_BUFFER else None
+
+
 # --- Criar nova tarefa ---
 # Este endpoint suporta dois modos:
 # 1) x-api-key → utilizado por Copilot/PowerApps
 # 2) JWT → utilizado pelo website
+# Com o cabeçalho Idempotency-Key, repetir o pedido não cria uma segunda tarefa.
 @router.post("", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
 @router.post("/", response_model=TaskOut, status_code=status.HTTP_201_CREATED)
 async def create_task(
@@ -99,35 +270,69 @@ async def create_task(
     except Exception as e:
         print("⚠️ [DEBUG] Erro ao ler o corpo do pedido:", e)
 
+    # Repetições com o mesmo Idempotency-Key devolvem a tarefa criada da primeira vez.
+    chave_idempotencia = request.headers.get("Idempotency-Key")
+    corpo = await request.body()
+
+    async def responder(identidade, criar):
+        resposta, repetida = await idempotencia.executar_async(
+            identidade, chave_idempotencia, corpo, status.HTTP_201_CREATED, criar
+        )
+        if repetida:
+            print(f"🔁 [DEBUG] Pedido repetido ({chave_idempotencia}), devolvida a resposta original.")
+            return JSONResponse(resposta, status_code=status.HTTP_201_CREATED, headers={"Idempotent-Replayed": "true"})
+        return resposta
+
     client_key = request.headers.get("x-api-key")
 
     # --- 1️⃣ Origem PowerApps / Copilot ---
     if client_key and client_key == API_KEY:
-        new_task = task.dict()
-
         # Tenta identificar o utilizador com base no email enviado no header
         user_email = request.headers.get("x-user-email")
         print(f"📧 [DEBUG] Email recebido no header: {user_email}")
 
-        if user_email:
-            user = users_collection.find_one({"email": user_email})
-
-            if user:
-                new_task["username"] = user.get("nome", user_email)
-                print(f"✅ [DEBUG] Utilizador encontrado: {new_task['username']}")
+        # Validação, custo e procura do utilizador vão ao Mongo: correm numa thread.
+        def preparar() -> dict:
+            new_task = task.dict()
+            validar_referencias(new_task)
+            new_task["valor_euro"] = custos.calcular_valor(new_task)
+            new_task["data_iso"] = data_iso(new_task.get("data"))
+            new_task.update(sincronizacao.campos_criacao())
+
+            if user_email:
+                user = users_collection.find_one({"email": user_email})
+
+                if user:
+                    new_task["username"] = user.get("nome", user_email)
+                    print(f"✅ [DEBUG] Utilizador encontrado: {new_task['username']}")
+                else:
+                    new_task["username"] = user_email
+                    print("⚠️ [DEBUG] Email não registado, usando o próprio email como username.")
             else:
-                new_task["username"] = user_email
-                print("⚠️ [DEBUG] Email não registado, usando o próprio email como username.")
-        else:
-            new_task["username"] = "copilot"
-            print("⚠️ [DEBUG] Nenhum email recebido — usando 'copilot'.")
+                new_task["username"] = "copilot"
+                print("⚠️ [DEBUG] Nenhum email recebido — usando 'copilot'.")
+
+            return new_task
+
+        async def criar():
+            new_task = await to_thread.run_sync(preparar)
+
+            if buffer_tarefas is not None and buffer_tarefas.ativo:
+                try:
+                    created_task = formatar_tarefa(await buffer_tarefas.inserir(new_task))
+                except BufferCheio:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Demasiadas tarefas em espera. Tenta novamente dentro de instantes.",
+                        headers={"Retry-After": "1"},
+                    )
+            else:
+                created_task = await to_thread.run_sync(inserir_tarefa, new_task)
 
-        result = tasks_collection.insert_one(new_task)
-        created_task = tasks_collection.find_one({"_id": result.inserted_id})
-        created_task["id"] = str(created_task.pop("_id"))
+            print("✅ [DEBUG] Tarefa criada via x-api-key:", created_task)
+            return created_task
 
-        print("✅ [DEBUG] Tarefa criada via x-api-key:", created_task)
-        return created_task
+        return await responder(f"api:{user_email or 'copilot'}", criar)
 
     # --- 2️⃣ Origem Website via JWT ---
     token = request.headers.get("Authorization")
@@ -137,15 +342,21 @@ async def create_task(
             username = payload.get("sub")
 
             if username:
-                new_task = task.dict()
-                new_task["username"] = username
-
-                result = tasks_collection.insert_one(new_task)
-                created_task = tasks_collection.find_one({"_id": result.inserted_id})
-                created_task["id"] = str(created_task.pop("_id"))
-
-                print("✅ [DEBUG] Tarefa criada via JWT:", created_task)
-                return created_task
+                def preparar_e_inserir() -> dict:
+                    new_task = task.dict()
+                    validar_referencias(new_task)
+                    new_task["username"] = username
+                    new_task["valor_euro"] = custos.calcular_valor(new_task)
+                    new_task["data_iso"] = data_iso(new_task.get("data"))
+                    new_task.update(sincronizacao.campos_criacao())
+                    return inserir_tarefa(new_task)
+
+                async def criar():
+                    created_task = await to_thread.run_sync(preparar_e_inserir)
+                    print("✅ [DEBUG] Tarefa criada via JWT:", created_task)
+                    return created_task
+
+                return await responder(f"user:{username}", criar)
 
         except JWTError:
             raise HTTPException(status_code=401, detail="Token inválido.")
@@ -154,16 +365,9 @@ async def create_task(
     raise HTTPException(status_code=401, detail="Não autorizado")
 
 
-# --- Listar tarefas ---
-# Permite listar tarefas com filtros dinâmicos.
-# Suporta:
-# • PowerApps/Copilot — acesso a todas as tarefas
-# • Website — apenas tarefas do utilizador autenticado
-@router.get("", response_model=list[dict])
-@router.get("/", response_model=list[dict])
-def list_user_tasks(
-    request: Request,
-    username: Optional[str] = Depends(lambda request=None: None),
+# --- Parâmetros de filtro da listagem ---
+# Partilhados por GET /tasks e GET /tasks/facets.
+def parametros_listagem(
     descricao: Optional[str] = Query(None),
     cliente: Optional[str] = Query(None),
     parceiro: Optional[str] = Query(None),
@@ -178,54 +382,46 @@ def list_user_tasks(
     faturavel: Optional[str] = Query(None),
     viagem_faturavel: Optional[str] = Query(None),
     local: Optional[str] = Query(None),
-    valor_euro: Optional[float] = Query(None)
-):
-    """
-    Lista tarefas, com opção de aplicar filtros flexíveis.
-    O comportamento depende da origem:
-    • PowerApps/Copilot → acesso completo
-    • Website → apenas tarefas associadas ao utilizador autenticado
-    """
-
+    valor_euro: Optional[float] = Query(None),
+    data_de: Optional[str] = Query(None),
+    data_ate: Optional[str] = Query(None),
+    valor_min: Optional[float] = Query(None),
+    valor_max: Optional[float] = Query(None),
+    clientes: Optional[list[str]] = Query(None)
+) -> dict:
+    return {
+        "descricao": descricao,
+        "cliente": cliente,
+        "parceiro": parceiro,
+        "produto": produto,
+        "contrato": contrato,
+        "atividade": atividade,
+        "data": data,
+        "distancia_viagem": distancia_viagem,
+        "tempo_viagem": tempo_viagem,
+        "tempo_atividade": tempo_atividade,
+        "tempo_faturado": tempo_faturado,
+        "faturavel": faturavel,
+        "viagem_faturavel": viagem_faturavel,
+        "local": local,
+        "valor_euro": valor_euro,
+        "data_de": data_de,
+        "data_ate": data_ate,
+        "valor_min": valor_min,
+        "valor_max": valor_max,
+        "clientes": clientes
+    }
+
+
+# --- Âmbito da listagem ---
+# • PowerApps/Copilot (x-api-key) → todas as tarefas (devolve None)
+# • Website (JWT) → apenas as tarefas do utilizador autenticado (devolve o username)
+def ambito_listagem(request: Request) -> Optional[str]:
     client_key = request.headers.get("x-api-key")
 
-    # --- 1️⃣ Modo PowerApps/Copilot (x-api-key) ---
     if client_key and client_key == API_KEY:
-        filtro = {}
+        return None
 
-        # Prepara dinamicamente os filtros
-        parametros = {
-            "descricao": descricao,
-            "cliente": cliente,
-            "parceiro": parceiro,
-            "produto": produto,
-            "contrato": contrato,
-            "atividade": atividade,
-            "data": data,
-            "distancia_viagem": distancia_viagem,
-            "tempo_viagem": tempo_viagem,
-            "tempo_atividade": tempo_atividade,
-            "tempo_faturado": tempo_faturado,
-            "faturavel": faturavel,
-            "viagem_faturavel": viagem_faturavel,
-            "local": local,
-            "valor_euro": valor_euro
-        }
-
-        for campo, valor in parametros.items():
-            if valor is not None:
-                filtro[campo] = (
-                    {"$regex": valor, "$options": "i"} if isinstance(valor, str) else valor
-                )
-
-        tasks = []
-        for t in tasks_collection.find(filtro).sort("data", -1).limit(200):
-            t["id"] = str(t.pop("_id"))
-            tasks.append(t)
-
-        return tasks
-
-    # --- 2️⃣ Modo Website (JWT) ---
     token = request.headers.get("Authorization")
     if token and token.startswith("Bearer "):
         try:
@@ -233,50 +429,131 @@ def list_user_tasks(
             username = payload.get("sub")
 
             if username:
-                filtro = {"username": username}
-
-                # Também aplica filtros opcionais fornecidos pelo utilizador
-                parametros = {
-                    "descricao": descricao,
-                    "cliente": cliente,
-                    "parceiro": parceiro,
-                    "produto": produto,
-                    "contrato": contrato,
-                    "atividade": atividade,
-                    "data": data,
-                    "distancia_viagem": distancia_viagem,
-                    "tempo_viagem": tempo_viagem,
-                    "tempo_atividade": tempo_atividade,
-                    "tempo_faturado": tempo_faturado,
-                    "faturavel": faturavel,
-                    "viagem_faturavel": viagem_faturavel,
-                    "local": local,
-                    "valor_euro": valor_euro
-                }
-
-                for campo, valor in parametros.items():
-                    if valor is not None:
-                        filtro[campo] = (
-                            {"$regex": valor, "$options": "i"} if isinstance(valor, str) else valor
-                        )
-
-                tasks = []
-                for t in tasks_collection.find(filtro).sort("data", -1).limit(200):
-                    t["id"] = str(t.pop("_id"))
-                    tasks.append(t)
-
-                return tasks
+                return username
 
         except JWTError:
             raise HTTPException(status_code=401, detail="Token inválido.")
 
-    # --- 3️⃣ Sem autenticação válida ---
     raise HTTPException(status_code=401, detail="Não autorizado")
 
 
+# --- Listar tarefas ---
+# Permite listar tarefas com filtros dinâmicos.
+# Suporta:
+# • PowerApps/Copilot — acesso a todas as tarefas
+# • Website — apenas tarefas do utilizador autenticado
+@router.get("", response_model=list[dict])
+@router.get("/", response_model=list[dict])
+def list_user_tasks(
+    request: Request,
+    response: Response,
+    parametros: dict = Depends(parametros_listagem),
+    sort: Optional[str] = Query(None),
+    count: Optional[str] = ModoContagem
+):
+    """
+    Lista tarefas, com opção de aplicar filtros flexíveis.
+    O comportamento depende da origem:
+    • PowerApps/Copilot → acesso completo
+    • Website → apenas tarefas associadas ao utilizador autenticado
+    """
+
+    username = ambito_listagem(request)
+    filtro = construir_filtro(parametros, {"username": username} if username else None)
+    definir_total(response, tasks_collection, filtro, count)
+
+    tasks = []
+    for t in tasks_collection.find(filtro).sort(construir_ordenacao(sort)).limit(200):
+        t["id"] = str(t.pop("_id"))
+        tasks.append(t)
+
+    return tasks
+
+
+# --- Valores para os filtros da grelha (facetas) ---
+# Endpoint GET /tasks/facets (aceita os mesmos filtros de GET /tasks)
+# Valores distintos de cliente, contrato, produto, atividade e faturavel, com o número
+# de tarefas de cada um, calculados numa única agregação $facet. O resultado fica em
+# cache por utilizador até à sua próxima escrita de tarefas (versão "tarefas:<username>").
+# Sem utilizador (x-api-key, todas as tarefas) passa pelo admin_coalescedor, como as
+# outras consultas globais: não há uma versão global incrementada em cada escrita.
+CAMPOS_FACETAS = ("cliente", "contrato", "produto", "atividade", "faturavel")
+MAX_VALORES_FACETA = 500
+
+facetas_cache = CacheLocal(ttl=3600, max_entradas=1024)
+
+
+def chave_versao_tarefas(username: Optional[str]) -> Optional[str]:
+    return f"tarefas:{username}" if username else None
+
+
+def calcular_facetas(filtro: dict) -> dict:
+    pipeline = [
+        {"$match": filtro},
+        {"$facet": {
+            campo: [
+                {"$group": {"_id": f"${campo}", "total": {"$sum": 1}}},
+                {"$sort": {"total": -1, "_id": 1}},
+                {"$limit": MAX_VALORES_FACETA},
+            ]
+            for campo in CAMPOS_FACETAS
+        }},
+    ]
+
+    resultado = next(tasks_collection.aggregate(pipeline), {})
+
+    return {
+        campo: [{"valor": g["_id"], "total": g["total"]} for g in resultado.get(campo, [])]
+        for campo in CAMPOS_FACETAS
+    }
+
+
+@router.get("/facets")
+def get_task_facets(request: Request, parametros: dict = Depends(parametros_listagem)):
+    username = ambito_listagem(request)
+    filtro = construir_filtro(parametros, {"username": username} if username else None)
+    chave = (username, repr(sorted(filtro.items())))
+
+    if username is None:
+        return admin_coalescedor.executar(("facetas",) + chave, lambda: calcular_facetas(filtro))
+
+    return facetas_cache.obter_ou_calcular(
+        chave, lambda: calcular_facetas(filtro), versao=versao(chave_versao_tarefas(username))
+    )
+
+
+# --- Sincronização incremental ---
+# Endpoint GET /tasks/changes?since=<sync_token>
+# Devolve as tarefas criadas/alteradas e os ids das eliminadas desde o token,
+# mais o token para o próximo pedido. Sem "since" (ou com um token demasiado antigo)
+# devolve full_resync = true: o cliente recarrega GET /tasks e guarda o sync_token.
+# Como em GET /tasks: x-api-key vê todas as tarefas, o JWT apenas as do utilizador.
+@router.get("/changes")
+def list_task_changes(request: Request, since: Optional[str] = Query(None)):
+    client_key = request.headers.get("x-api-key")
+
+    if client_key and client_key == API_KEY:
+        filtro = {}
+    else:
+        filtro = {"username": get_current_user(request)}
+
+    try:
+        desde = sincronizacao.ler_token(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Token de sincronização inválido.")
+
+    return sincronizacao.alteracoes_desde(filtro, desde)
+
+
 # --- Administrador: listar todas as tarefas ---
 @router.get("/all", response_model=list[dict])
-def list_all_tasks_admin(request: Request):
+def list_all_tasks_admin(
+    request: Request,
+    response: Response,
+    count: Optional[str] = ModoContagem,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0)
+):
     """
     Lista todas as tarefas existentes,
     acessível apenas para utilizadores com papel de administrador.
@@ -298,12 +575,76 @@ def list_all_tasks_admin(request: Request):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Acesso negado.")
 
-    tasks = []
-    for t in tasks_collection.find().sort("data", -1):
-        t["id"] = str(t.pop("_id"))
-        tasks.append(t)
+    definir_total(response, tasks_collection, None, count)
 
-    return tasks
+    return admin_coalescedor.executar(
+        chave_pedido(request, role), lambda: listar_todas_tarefas(limit, offset)
+    )
+
+
+# --- Escritas condicionadas ao dono ---
+# Update e delete são uma única operação filtrada por _id + username. Só quando
+# não há correspondência é feita uma segunda leitura, para distinguir 404 de 403.
+def _id_tarefa(task_id: str) -> ObjectId:
+    try:
+        return ObjectId(task_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="ID inválido.")
+
+
+def _falha_dono(obj_id: ObjectId, mensagem_403: str):
+    if tasks_collection.find_one({"_id": obj_id}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
+    raise HTTPException(status_code=403, detail=mensagem_403)
+
+
+# Aplica "dados" à tarefa do utilizador e devolve-a já atualizada.
+# valor_euro é sempre derivado: em Python quando a atividade e o tempo faturado vêm
+# ambos no pedido (ou nenhum), no próprio update (pipeline) quando vem só um deles.
+def atualizar_tarefa(obj_id: ObjectId, username: str, dados: dict) -> dict:
+    dados = {k: v for k, v in dados.items() if k != "valor_euro"}
+    try:
+        validar_referencias(dados)
+    except HTTPException:
+        # Quem não é dono da tarefa recebe 404/403, não os erros de validação.
+        if tasks_collection.find_one({"_id": obj_id, "username": username}, {"_id": 1}) is None:
+            _falha_dono(obj_id, "Sem permissão para editar esta tarefa.")
+        raise
+    if "data" in dados:
+        dados["data_iso"] = data_iso(dados["data"])
+    afeta_custo = {"atividade", "tempo_faturado"} & set(dados)
+    tabela = custos.taxas()
+
+    operadores = sincronizacao.operadores_alteracao()
+    if len(afeta_custo) == 1:
+        update = [
+            {"$set": {
+                **{campo: {"$literal": valor} for campo, valor in dados.items()},
+                **operadores["$set"],
+                "revisao": {"$add": [{"$ifNull": ["$revisao", 0]}, 1]},
+            }},
+            {"$set": {"valor_euro": custos.valor_expr(tabela)}},
+        ]
+    else:
+        if afeta_custo:
+            dados["valor_euro"] = custos.calcular_valor(dados, tabela)
+        operadores["$set"].update(dados)
+        update = operadores
+
+    antes = tasks_collection.find_one_and_update(
+        {"_id": obj_id, "username": username},
+        update,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if antes is None:
+        _falha_dono(obj_id, "Sem permissão para editar esta tarefa.")
+
+    depois = {**antes, **dados, **operadores["$set"], "revisao": antes.get("revisao", 0) + 1}
+    if len(afeta_custo) == 1:
+        depois["valor_euro"] = custos.calcular_valor(depois, tabela)
+
+    registar_alteracao(antes, depois)
+    return depois
 
 
 # --- Atualizar tarefa ---
@@ -314,21 +655,23 @@ def update_task(task_id: str, updated: TaskBase, username: str = Depends(get_cur
     desde que esta pertença ao utilizador autenticado.
     """
 
-    try:
-        obj_id = ObjectId(task_id)
-    except:
-        raise HTTPException(status_code=400, detail="ID inválido.")
+    atualizar_tarefa(_id_tarefa(task_id), username, updated.dict())
 
-    task = tasks_collection.find_one({"_id": obj_id})
+    return {"message": "Tarefa atualizada com sucesso!"}
 
-    if not task:
-        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
 
-    if task.get("username") != username:
-        raise HTTPException(status_code=403, detail="Sem permissão para editar esta tarefa.")
+# --- Atualizar parcialmente uma tarefa ---
+# Endpoint PATCH /tasks/{task_id}
+# Só os campos enviados são alterados; devolve a tarefa atualizada.
+@router.patch("/{task_id}", response_model=TaskOut)
+def patch_task(task_id: str, updated: TaskUpdate, username: str = Depends(get_current_user)):
+    dados = updated.dict(exclude_unset=True)
+    dados.pop("valor_euro", None)
 
-    tasks_collection.update_one({"_id": obj_id}, {"$set": updated.dict()})
-    return {"message": "Tarefa atualizada com sucesso!"}
+    if not dados:
+        raise HTTPException(status_code=400, detail="Nenhum campo para atualizar.")
+
+    return formatar_tarefa(atualizar_tarefa(_id_tarefa(task_id), username, dados))
 
 
 # --- Eliminar tarefa ---
@@ -338,20 +681,15 @@ def delete_task(task_id: str, username: str = Depends(get_current_user)):
     Elimina uma tarefa pertencente ao utilizador autenticado.
     """
 
-    try:
-        obj_id = ObjectId(task_id)
-    except:
-        raise HTTPException(status_code=400, detail="ID inválido.")
+    obj_id = _id_tarefa(task_id)
+    task = tasks_collection.find_one_and_delete({"_id": obj_id, "username": username})
 
-    task = tasks_collection.find_one({"_id": obj_id})
+    if task is None:
+        _falha_dono(obj_id, "Sem permissão para eliminar esta tarefa.")
 
-    if not task:
-        raise HTTPException(status_code=404, detail="Tarefa não encontrada.")
-
-    if task.get("username") != username:
-        raise HTTPException(status_code=403, detail="Sem permissão para eliminar esta tarefa.")
+    sincronizacao.registar_remocao(task)
+    registar_alteracao(task, None)
 
-    tasks_collection.delete_one({"_id": obj_id})
     return {"message": "Tarefa eliminada com sucesso!"}
 
 
@@ -379,34 +717,4 @@ def get_atividade(request: Request, mes: int):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Acesso negado.")
 
-    tarefas = list(tasks_collection.find({}))
-    resultados = []
-
-    # Avalia vários formatos de data suportados
-    for t in tarefas:
-        data_str = t.get("data")
-        if not data_str:
-            continue
-
-        data = None
-        for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"):
-            try:
-                data = datetime.strptime(data_str, fmt)
-                break
-            except ValueError:
-                continue
-
-        if not data:
-            continue
-
-        if data.month == mes:
-            resultados.append({
-                "username": t.get("username"),
-                "cliente": t.get("cliente"),
-                "contrato": t.get("contrato"),
-                "data": data.strftime("%Y-%m-%d"),
-                "tempo_atividade": t.get("tempo_atividade")
-            })
-
-    resultados.sort(key=lambda x: (x["username"], x["data"]))
-    return resultados
+    return admin_coalescedor.executar(chave_pedido(request, role), lambda: atividade_mensal(mes))
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from jose import jwt, JWTError
 from bson import ObjectId
 from passlib.context import CryptContext
 from db import users_collection
 from schemas import UserBase, UserOut
 from config import SECRET_KEY
+from contagens import ModoContagem, definir_total
+from typing import Optional
 
 # Rota principal para utilizadores (prefixo /users).
 # Contém endpoints CRUD e gestão de password.
@@ -63,9 +65,16 @@ def create_user(user: UserBase, current_user: str = Depends(get_current_user)):
 # Endpoint GET /users/
 # Retorna lista de utilizadores; remove campo _id e password dos objetos retornados.
 @router.get("/", response_model=list[UserOut])
-def list_users(current_user: str = Depends(get_current_user)):
+def list_users(
+    response: Response,
+    count: Optional[str] = ModoContagem,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    current_user: str = Depends(get_current_user)
+):
     users = []
-    for u in users_collection.find():
+    definir_total(response, users_collection, None, count)
+    for u in users_collection.find().sort("_id", 1).skip(offset).limit(limit or 0):
         u["id"] = str(u["_id"])
         u.pop("_id", None)
         u.pop("password", None)  # 🔒 nunca devolver password
@@ -0,0 +1,217 @@
+import asyncio
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from db import db
+
+# --- Agendador de tarefas periódicas ---
+# Corre dentro do processo da API (iniciado/parado no lifespan do main.py).
+# Suporta jobs por intervalo ou por expressão cron (5 campos, UTC) com jitter.
+# Com vários workers, só um executa cada execução prevista ("slot"): antes de correr,
+# o worker reclama o slot na coleção scheduler_leases, o que só consegue se o slot
+# guardado for anterior. Um worker que morra não bloqueia os slots seguintes.
+leases_collection = db["scheduler_leases"]
+
+EPOCA = datetime(1970, 1, 1)
+
+
+# --- Expressões cron ---
+# "minuto hora dia-do-mês mês dia-da-semana"; cada campo aceita *, n, a-b, listas e /passo.
+# Dia da semana: 0 = domingo ... 6 = sábado (7 também é domingo).
+LIMITES_CRON = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _campo_cron(expr: str, minimo: int, maximo: int) -> set:
+    valores = set()
+
+    for parte in expr.split(","):
+        intervalo, _, passo = parte.partition("/")
+        passo = int(passo) if passo else 1
+
+        if intervalo == "*":
+            inicio, fim = minimo, maximo
+        elif "-" in intervalo:
+            inicio, fim = map(int, intervalo.split("-"))
+        else:
+            inicio = fim = int(intervalo)
+            if passo > 1:
+                fim = maximo
+
+        if inicio < minimo or fim > maximo or inicio > fim:
+            raise ValueError(f"Campo cron inválido: {expr}")
+
+        valores.update(range(inicio, fim + 1, passo))
+
+    return valores
+
+
+class Cron:
+    def __init__(self, expressao: str):
+        campos = expressao.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron inválida: {expressao}")
+
+        self.expressao = expressao
+        self.minutos, self.horas, self.dias, self.meses, dias_semana = (
+            _campo_cron(c, *limites) for c, limites in zip(campos, LIMITES_CRON)
+        )
+        self.dias_semana = {d % 7 for d in dias_semana}
+        # Como no cron clássico: se ambos os campos de dia estiverem restritos, basta um coincidir.
+        self._dia_livre = campos[2] == "*"
+        self._semana_livre = campos[4] == "*"
+
+    def _dia_coincide(self, d: datetime) -> bool:
+        dia = d.day in self.dias
+        semana = (d.isoweekday() % 7) in self.dias_semana
+        if self._dia_livre or self._semana_livre:
+            return dia and semana
+        return dia or semana
+
+    # Próximo instante (UTC, ao minuto) estritamente depois de "depois".
+    def proximo(self, depois: datetime) -> datetime:
+        d = depois.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = d + timedelta(days=366 * 5)
+
+        while d < limite:
+            if d.month not in self.meses or not self._dia_coincide(d):
+                d = (d + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if d.hour not in self.horas:
+                d = (d + timedelta(hours=1)).replace(minute=0)
+                continue
+            if d.minute not in self.minutos:
+                d += timedelta(minutes=1)
+                continue
+            return d
+
+        raise ValueError(f"A expressão cron nunca ocorre: {self.expressao}")
+
+
+# --- Job agendado ---
+class JobAgendado:
+    def __init__(self, nome: str, fn, intervalo: float = None, cron: str = None, jitter: float = 0):
+        if (intervalo is None) == (cron is None):
+            raise ValueError("Indica exatamente um de intervalo ou cron.")
+
+        self.nome = nome
+        self.fn = fn
+        self.intervalo = intervalo
+        self.cron = Cron(cron) if cron else None
+        self.jitter = jitter
+
+        # Métricas locais deste worker
+        self.execucoes = 0
+        self.falhas = 0
+        self.ignoradas = 0
+        self.duracao_total_ms = 0.0
+        self.ultima_duracao_ms = None
+        self.max_duracao_ms = 0.0
+        self.ultima_execucao = None
+        self.ultimo_erro = None
+        self.proxima_execucao = None
+
+    # Segundos até à próxima execução (inclui jitter). A execução prevista (sem jitter)
+    # fica em proxima_execucao e é igual em todos os workers: os intervalos contam-se
+    # a partir de EPOCA, não do arranque de cada worker.
+    def espera(self, agora: datetime) -> float:
+        if self.cron:
+            self.proxima_execucao = self.cron.proximo(agora)
+        else:
+            decorridos = (agora - EPOCA).total_seconds() // self.intervalo
+            self.proxima_execucao = EPOCA + timedelta(seconds=(decorridos + 1) * self.intervalo)
+
+        base = (self.proxima_execucao - agora).total_seconds()
+        return base + random.uniform(0, self.jitter)
+
+    def metricas(self) -> dict:
+        return {
+            "nome": self.nome,
+            "agenda": self.cron.expressao if self.cron else f"a cada {self.intervalo:g}s",
+            "execucoes": self.execucoes,
+            "falhas": self.falhas,
+            "ignoradas": self.ignoradas,
+            "ultima_duracao_ms": self.ultima_duracao_ms,
+            "media_duracao_ms": round(self.duracao_total_ms / self.execucoes, 1) if self.execucoes else None,
+            "max_duracao_ms": self.max_duracao_ms,
+            "ultima_execucao": self.ultima_execucao,
+            "proxima_execucao": self.proxima_execucao,
+            "ultimo_erro": self.ultimo_erro,
+        }
+
+
+class Agendador:
+    def __init__(self):
+        self.jobs = {}
+        self._tarefas = []
+        self.dono = None
+
+    def registar(self, nome: str, fn, intervalo: float = None, cron: str = None, jitter: float = 0):
+        self.jobs[nome] = JobAgendado(nome, fn, intervalo, cron, jitter)
+
+    # --- Lease (eleição de líder por slot) ---
+    # Reclama o slot se o guardado for anterior (ou se ainda não houver nenhum).
+    # Se outro worker já o tiver reclamado, o upsert falha com DuplicateKeyError.
+    def obter_lease(self, job: JobAgendado, slot: datetime) -> bool:
+        try:
+            leases_collection.find_one_and_update(
+                {"_id": job.nome, "$or": [{"slot": {"$lt": slot}}, {"slot": {"$exists": False}}]},
+                {"$set": {"slot": slot, "dono": self.dono, "reclamado_em": datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def _ciclo(self, job: JobAgendado):
+        while True:
+            await asyncio.sleep(job.espera(datetime.utcnow()))
+            slot = job.proxima_execucao
+
+            try:
+                lider = await asyncio.to_thread(self.obter_lease, job, slot)
+            except Exception as e:
+                print(f"⚠️ [scheduler] Falha ao obter lease de {job.nome}:", e)
+                continue
+
+            if not lider:
+                job.ignoradas += 1
+                continue
+
+            inicio = time.perf_counter()
+            job.ultima_execucao = datetime.utcnow()
+            try:
+                await asyncio.to_thread(job.fn)
+                job.ultimo_erro = None
+            except Exception as e:
+                job.falhas += 1
+                job.ultimo_erro = str(e)
+                traceback.print_exc()
+            finally:
+                duracao = (time.perf_counter() - inicio) * 1000
+                job.execucoes += 1
+                job.ultima_duracao_ms = round(duracao, 1)
+                job.duracao_total_ms += duracao
+                job.max_duracao_ms = max(job.max_duracao_ms, round(duracao, 1))
+
+    def iniciar(self):
+        self.dono = f"{socket.gethostname()}:{os.getpid()}"
+        self._tarefas = [asyncio.create_task(self._ciclo(job)) for job in self.jobs.values()]
+        print(f"⏰ Agendador iniciado com {len(self._tarefas)} job(s)")
+
+    async def parar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    def metricas(self) -> list:
+        return [job.metricas() for job in self.jobs.values()]
+
+
+agendador = Agendador()
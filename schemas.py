@@ -67,6 +67,27 @@ class ContractBase(BaseModel):
 class ContractOut(ContractBase):
     id: str
 
+
+# Custo consumido por atividade (horas faturadas x custo_hora da atividade)
+class ContractActivityCost(BaseModel):
+    atividade: Optional[str] = None
+    horas: float = 0.0
+    custo_hora: float = 0.0
+    custo: float = 0.0
+
+
+class ContractRollupOut(BaseModel):
+    id: str
+    contrato: str
+    cliente: str
+    estado: Optional[str] = None
+    valor_euro: Optional[float] = None
+    horas: float = 0.0
+    custo: float = 0.0
+    saldo: Optional[float] = None
+    consumo_pct: Optional[float] = None
+    por_atividade: list[ContractActivityCost] = []
+
 # --- Produtos ---
 
 
@@ -107,9 +128,29 @@ class TaskBase(BaseModel):
     local: Optional[str] = "Employee House"
     valor_euro: Optional[Union[str, float]] = 0
 
+# Atualização parcial (PATCH): só os campos enviados são alterados.
+class TaskUpdate(BaseModel):
+    descricao: Optional[str] = None
+    cliente: Optional[str] = None
+    parceiro: Optional[str] = None
+    produto: Optional[str] = None
+    contrato: Optional[str] = None
+    atividade: Optional[str] = None
+    data: Optional[str] = None
+    distancia_viagem: Optional[Union[str, float]] = None
+    tempo_viagem: Optional[str] = None
+    tempo_atividade: Optional[str] = None
+    tempo_faturado: Optional[str] = None
+    faturavel: Optional[str] = None
+    viagem_faturavel: Optional[str] = None
+    local: Optional[str] = None
+    valor_euro: Optional[Union[str, float]] = None
+
 class TaskOut(TaskBase):
     id: str
     username: str
+    updated_at: Optional[datetime] = None
+    revisao: Optional[int] = None
 
 
 # --- Parceiros ---
@@ -153,6 +194,28 @@ class ProjectOut(ProjectBase):
     id: str
 
 
+# Resultado do recálculo de horas (inclui horas ainda disponíveis no contrato)
+class ProjectHoursOut(ProjectOut):
+    horas_restantes: Optional[float] = 0.0
+
+
+# Horas de um projeto agrupadas por um critério (utilizador, atividade ou mês)
+class HorasAgrupadas(BaseModel):
+    chave: Optional[str] = None
+    horas: float = 0.0
+    tarefas: int = 0
+
+
+class ProjectBreakdownOut(BaseModel):
+    id: str
+    cliente: str
+    contrato: str
+    horas_gastas: float = 0.0
+    por_utilizador: list[HorasAgrupadas] = []
+    por_atividade: list[HorasAgrupadas] = []
+    por_mes: list[HorasAgrupadas] = []
+
+
 # --- Presets ----
 
 class PresetBase(BaseModel):
@@ -178,4 +241,11 @@ class PresetBase(BaseModel):
 
 
 class PresetOut(PresetBase):
-    id: str
\ No newline at end of file
+    id: str
+
+# --- Relatórios assíncronos ---
+
+class ReportRequest(BaseModel):
+    tipo: str                     # "tarefas" (todas as tarefas) ou "atividade" (atividade mensal)
+    mes: Optional[int] = None     # obrigatório para "atividade"
+    refresh: bool = False         # true = gera de novo mesmo que exista um relatório concluído
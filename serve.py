@@ -0,0 +1,36 @@
+import uvicorn
+from config import PORT, WEB_CONCURRENCY
+
+# --- Servidor de produção ---
+# Arranca o uvicorn com vários workers (processos), configurados por variáveis de ambiente:
+#   PORT                 porta HTTP (Railway define-a automaticamente)
+#   WEB_CONCURRENCY      número de workers (por omissão um por CPU)
+#   THREADPOOL_SIZE      threads por worker para endpoints síncronos
+#   MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE / MONGO_*_TIMEOUT_MS / MONGO_COMPRESSORS
+# Cada worker cria o seu próprio MongoClient no primeiro pedido (ver db.py).
+#
+# Escalabilidade por worker (precisa de um mongod acessível via MONGODB_URL):
+#   python -m tools.bench_workers --workers 1,2,4 --concurrency 32
+# Última medição em tools/bench_workers_results.json (modo mongomock, 1 CPU partilhado
+# com o gerador de carga: mais workers do que CPUs só acrescentam contenção).
+#
+# Estado por worker: com WEB_CONCURRENCY > 1 cada processo tem a sua memória, pelo que
+#   - eventos em tempo real: EVENT_BUS tem de ser "mongo" (é o valor por omissão com
+#     vários workers), senão cada cliente SSE só vê as escritas do seu worker;
+#   - coalescência (COALESCE_TTL) e caches locais só valem dentro de cada worker;
+#     invalidar() num worker não limpa os outros (daí as versões em cache_versions);
+#   - catálogos do autocomplete/validação: os outros workers veem uma escrita ao fim
+#     de até catalogo.VERIFICACAO segundos;
+#   - buffer de escrita (TASK_WRITE_BUFFER): um buffer por worker.
+if __name__ == "__main__":
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        # Ligações SSE (/events/stream) nunca terminam sozinhas: no shutdown são
+        # fechadas ao fim deste tempo (os clientes voltam a ligar a outro worker).
+        timeout_graceful_shutdown=10,
+    )
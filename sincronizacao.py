@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, UpdateOne
+from db import db, tasks_collection
+
+# --- Sincronização incremental de tarefas ---
+# Cada escrita numa tarefa atualiza "updated_at" (UTC) e incrementa "revisao".
+# As tarefas eliminadas deixam um registo (tombstone) em tasks_tombstones durante
+# RETENCAO, para que os clientes saibam o que remover sem voltar a pedir tudo.
+# O token de sincronização é um instante ISO 8601; quem o recebe pede depois
+# apenas o que mudou desde esse instante (GET /tasks/changes?since=).
+tombstones_collection = db["tasks_tombstones"]
+
+# Tempo durante o qual as remoções ficam registadas; tokens mais antigos obrigam a ressincronizar.
+RETENCAO = timedelta(days=30)
+
+# Margem para escritas em curso e relógios ligeiramente diferentes entre workers:
+# o token devolvido fica este tempo atrás, pelo que algumas alterações podem
+# ser enviadas duas vezes (o cliente substitui-as pelo id).
+MARGEM = timedelta(seconds=5)
+
+# Acima deste número de alterações é mais barato o cliente recarregar a lista.
+LIMITE_ALTERACOES = 500
+
+
+def criar_indices():
+    tasks_collection.create_index([("username", ASCENDING), ("updated_at", ASCENDING)])
+    tasks_collection.create_index([("updated_at", ASCENDING)])
+    tombstones_collection.create_index([("removida_em", ASCENDING)], expireAfterSeconds=int(RETENCAO.total_seconds()))
+    tombstones_collection.create_index([("username", ASCENDING), ("removida_em", ASCENDING)])
+
+
+# Campos de controlo de uma tarefa nova.
+def campos_criacao(agora: datetime = None) -> dict:
+    return {"updated_at": agora or datetime.utcnow(), "revisao": 1}
+
+
+# Operadores a juntar ao update de uma tarefa existente.
+def operadores_alteracao(agora: datetime = None) -> dict:
+    return {"$set": {"updated_at": agora or datetime.utcnow()}, "$inc": {"revisao": 1}}
+
+
+# Escrita em lote por jobs de fundo: cada tarefa lida só é alterada se a revisao não
+# mudou desde a leitura. Devolve (gravadas, alteradas): as tarefas lidas cuja escrita
+# foi aplicada e o estado atual (com "projecao") das que foram alteradas entretanto.
+# As gravadas reconhecem-se por terem exatamente o que este lote escreveu (updated_at,
+# revisao seguinte e campos do $set, que têm de estar na projeção).
+def atualizar_se_inalteradas(tarefas: list, operadores: list, projecao: dict) -> tuple:
+    agora = datetime.utcnow()
+    agora = agora.replace(microsecond=agora.microsecond // 1000 * 1000)  # precisão do Mongo
+
+    operacoes = []
+    for t, ops in zip(tarefas, operadores):
+        alteracao = operadores_alteracao(agora)
+        alteracao["$set"].update(ops.get("$set", {}))
+        operacoes.append(UpdateOne({"_id": t["_id"], "revisao": t.get("revisao")}, alteracao))
+
+    result = tasks_collection.bulk_write(operacoes, ordered=False)
+    if result.matched_count == len(operacoes):
+        return tarefas, []
+
+    por_id = {t["_id"]: (t, ops.get("$set", {})) for t, ops in zip(tarefas, operadores)}
+    gravadas, alteradas = [], []
+    for atual in tasks_collection.find({"_id": {"$in": list(por_id)}}, {**projecao, "updated_at": 1}):
+        t, escrito = por_id[atual["_id"]]
+        if (
+            atual.get("updated_at") == agora
+            and atual.get("revisao") == (t.get("revisao") or 0) + 1
+            and all(atual.get(campo) == valor for campo, valor in escrito.items())
+        ):
+            gravadas.append(t)
+        else:
+            alteradas.append(atual)
+    return gravadas, alteradas
+
+
+def registar_remocao(task: dict):
+    tombstones_collection.replace_one(
+        {"_id": task["_id"]},
+        {"username": task.get("username"), "removida_em": datetime.utcnow()},
+        upsert=True,
+    )
+
+
+def formatar_token(instante: datetime) -> str:
+    return instante.strftime("%Y-%m-%dT%H:%M:%S.") + f"{instante.microsecond // 1000:03d}Z"
+
+
+# Converte o token recebido num datetime UTC (sem tzinfo). ValueError se for inválido.
+def ler_token(token: str) -> datetime:
+    instante = datetime.fromisoformat(token.strip().replace(" ", "+"))
+    if instante.tzinfo is not None:
+        instante = (instante - instante.utcoffset()).replace(tzinfo=None)
+    return instante
+
+
+# Alterações das tarefas que respeitam "filtro" desde o token "desde" (None = primeira sincronização).
+# Com full_resync = True o cliente deve recarregar a lista (GET /tasks) e guardar o novo token.
+def alteracoes_desde(filtro: dict, desde: datetime = None) -> dict:
+    agora = datetime.utcnow()
+    token = agora - MARGEM
+    if desde is not None:
+        token = max(token, desde)
+
+    resposta = {"sync_token": formatar_token(token), "full_resync": False, "alteradas": [], "removidas": []}
+
+    if desde is None or desde < agora - RETENCAO:
+        resposta["full_resync"] = True
+        return resposta
+
+    alteradas = []
+    cursor = tasks_collection.find({**filtro, "updated_at": {"$gt": desde}}).sort("updated_at", ASCENDING)
+    for t in cursor.limit(LIMITE_ALTERACOES + 1):
+        t["id"] = str(t.pop("_id"))
+        alteradas.append(t)
+
+    filtro_remocoes = {"removida_em": {"$gt": desde}}
+    if "username" in filtro:
+        filtro_remocoes["username"] = filtro["username"]
+    removidas = [
+        str(r["_id"])
+        for r in tombstones_collection.find(filtro_remocoes, {"_id": 1}).limit(LIMITE_ALTERACOES + 1)
+    ]
+
+    if len(alteradas) + len(removidas) > LIMITE_ALTERACOES:
+        resposta["full_resync"] = True
+        return resposta
+
+    resposta["alteradas"] = alteradas
+    resposta["removidas"] = removidas
+    return resposta
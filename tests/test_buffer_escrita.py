@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from buffer_escrita import BufferEscrita, BufferCheio
+
+# --- Buffer de escrita (buffer_escrita.py) ---
+# Corre com: pip install -r requirements-dev.txt && python -m pytest -q tests
+
+
+def _buffer(colecao, lotes=None, **kwargs):
+    opcoes = {"max_documentos": 10, "intervalo_ms": 50, "capacidade": 1000}
+    opcoes.update(kwargs)
+    ao_inserir = (lambda docs: lotes.append(len(docs))) if lotes is not None else None
+    return BufferEscrita(colecao, ao_inserir=ao_inserir, **opcoes)
+
+
+def test_agrupa_pedidos_simultaneos_em_lotes():
+    colecao = mongomock.MongoClient().db.tasks
+    lotes = []
+
+    async def cenario():
+        buffer = _buffer(colecao, lotes)
+        buffer.iniciar()
+        gravados = await asyncio.gather(*(buffer.inserir({"n": i}) for i in range(25)))
+        await buffer.parar()
+        return buffer, gravados
+
+    buffer, gravados = asyncio.run(cenario())
+
+    assert lotes == [10, 10, 5]
+    assert buffer.lotes == 3 and buffer.documentos == 25
+    assert all("_id" in doc for doc in gravados)
+    assert [doc["n"] for doc in gravados] == list(range(25))
+    assert colecao.count_documents({}) == 25
+
+
+def test_lote_parcial_gravado_ao_fim_do_intervalo():
+    colecao = mongomock.MongoClient().db.tasks
+    lotes = []
+
+    async def cenario():
+        buffer = _buffer(colecao, lotes, intervalo_ms=20)
+        buffer.iniciar()
+        await buffer.inserir({"n": 1})
+        await buffer.parar()
+
+    asyncio.run(cenario())
+
+    assert lotes == [1]
+    assert colecao.count_documents({}) == 1
+
+
+def test_fila_cheia_lanca_buffer_cheio():
+    colecao = mongomock.MongoClient().db.tasks
+
+    async def cenario():
+        buffer = _buffer(colecao, capacidade=2)
+        buffer.iniciar()
+        resultados = await asyncio.gather(
+            *(buffer.inserir({"n": i}) for i in range(3)), return_exceptions=True
+        )
+        await buffer.parar()
+        return resultados
+
+    resultados = asyncio.run(cenario())
+
+    assert [isinstance(r, BufferCheio) for r in resultados] == [False, False, True]
+    assert colecao.count_documents({}) == 2
+
+
+def test_parar_grava_o_que_ficou_na_fila():
+    colecao = mongomock.MongoClient().db.tasks
+    lotes = []
+
+    async def cenario():
+        buffer = _buffer(colecao, lotes, max_documentos=4, intervalo_ms=60_000)
+        buffer.iniciar()
+        pedidos = [asyncio.ensure_future(buffer.inserir({"n": i})) for i in range(6)]
+        await asyncio.sleep(0.05)
+        assert colecao.count_documents({}) == 4
+        await buffer.parar()
+        return await asyncio.gather(*pedidos)
+
+    gravados = asyncio.run(cenario())
+
+    assert lotes == [4, 2]
+    assert len(gravados) == 6
+    assert colecao.count_documents({}) == 6
+
+
+def test_post_tasks_devolve_503_com_buffer_cheio(monkeypatch):
+    from tools.mongo_local import preparar_ambiente
+
+    monkeypatch.setenv("TASK_WRITE_BUFFER", "1")
+    preparar_ambiente("teste_buffer_escrita")
+
+    from fastapi.testclient import TestClient
+    import main
+    from routes import tasks
+
+    if tasks.buffer_tarefas is None:
+        pytest.skip("routes.tasks já tinha sido importado sem TASK_WRITE_BUFFER")
+
+    async def cheio(documento):
+        raise BufferCheio()
+
+    with TestClient(main.app) as cliente:
+        monkeypatch.setattr(tasks.buffer_tarefas, "inserir", cheio)
+        resposta = cliente.post(
+            "/tasks/",
+            json={"descricao": "teste"},
+            headers={"x-api-key": tasks.API_KEY, "x-user-email": "teste@f5.pt"},
+        )
+
+    assert resposta.status_code == 503
+    assert resposta.headers["Retry-After"] == "1"
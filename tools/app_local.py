@@ -0,0 +1,25 @@
+"""
+Aplicação com Mongo em memória e dados sintéticos, para medir a API sem mongod.
+
+Cada worker uvicorn importa este módulo e gera o seu próprio seed (determinístico,
+igual em todos os workers). Usado por tools.bench_workers --mongomock:
+
+    python -m uvicorn tools.app_local:app --workers 2 --port 8080
+
+BENCH_SCALE (0.05 por omissão) e BENCH_SEED controlam o volume e a semente.
+"""
+import contextlib
+import os
+
+from tools.mongo_local import preparar_ambiente
+
+preparar_ambiente("f5diarios_app_local")
+
+from db import db  # noqa: E402
+from tools.seed import popular  # noqa: E402
+
+with open(os.devnull, "w") as _nulo, contextlib.redirect_stdout(_nulo):
+    popular(db, float(os.getenv("BENCH_SCALE", "0.05")), seed=int(os.getenv("BENCH_SEED", "28")),
+            drop=True, verbose=False)
+
+from main import app  # noqa: E402,F401
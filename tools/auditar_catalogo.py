@@ -0,0 +1,65 @@
+"""
+Lista as referências das tarefas que não existem nos catálogos
+(clientes, contratos, parceiros, produtos e atividades), com sugestões.
+
+    python -m tools.auditar_catalogo
+    python -m tools.auditar_catalogo --username joao --top 50
+
+Só lê: as tarefas não são alteradas. Usa a base definida em MONGODB_URL / DB_NAME (.env).
+"""
+import argparse
+import time
+from collections import Counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoria das referências das tarefas F5TCI")
+    parser.add_argument("--username")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--top", type=int, default=20, help="valores inválidos mostrados por campo")
+    args = parser.parse_args()
+
+    import catalogo
+    from db import tasks_collection
+
+    filtro = {"username": args.username} if args.username else {}
+    projecao = {campo: 1 for campo in catalogo.CAMPOS_TAREFA}
+
+    inicio = time.perf_counter()
+    total = 0
+    invalidas = 0
+    contagens = {campo: Counter() for campo in catalogo.CAMPOS_TAREFA}
+    sugestoes = {}
+
+    def auditar(lote):
+        nonlocal invalidas
+        for erros in catalogo.validar_lote(lote).values():
+            invalidas += 1
+            for erro in erros:
+                chave = (erro["campo"], erro["valor"])
+                contagens[erro["campo"]][erro["valor"]] += 1
+                sugestoes.setdefault(chave, erro["sugestoes"])
+
+    lote = []
+    for t in tasks_collection.find(filtro, projecao, batch_size=args.batch_size):
+        lote.append(t)
+        total += 1
+        if len(lote) >= args.batch_size:
+            auditar(lote)
+            lote = []
+    if lote:
+        auditar(lote)
+
+    for campo, contagem in contagens.items():
+        if not contagem:
+            continue
+        print(f"\n❌ {campo}: {len(contagem)} valor(es) inexistente(s)")
+        for valor, n in contagem.most_common(args.top):
+            sugestao = ", ".join(sugestoes[(campo, valor)]) or "-"
+            print(f"   {n:>7}  {valor!r}  → {sugestao}")
+
+    print(f"\n✅ {total} tarefas analisadas em {time.perf_counter() - inicio:.1f}s; {invalidas} com referências inválidas")
+
+
+if __name__ == "__main__":
+    main()
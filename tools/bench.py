@@ -0,0 +1,194 @@
+"""
+Micro-benchmarks das funções mais usadas da API.
+
+Corre offline contra um Mongo em memória (mongomock) ou contra um mongod local
+(dependências em requirements-dev.txt):
+
+    python -m tools.bench                      # compara com tools/bench_baseline.json
+    python -m tools.bench --save-baseline      # grava novos valores de referência
+    python -m tools.bench --mongo-url mongodb://localhost:27017
+
+Cada caso é medido em várias rondas e fica o melhor tempo por operação (µs).
+Um caso é considerado regressão quando fica mais lento do que
+baseline * threshold (1.25 por omissão); nesse caso o processo termina com código 1.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from tools.mongo_local import preparar_ambiente
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+
+
+# --- Dados de teste ---
+# Pequeno conjunto determinístico com os vários formatos de "data" e durações "HH:MM".
+def popular_dados(db, seed: int = 26, n_tarefas: int = 2000):
+    rnd = random.Random(seed)
+
+    db["users"].insert_one({"username": "bench", "email": "bench@f5tci.com", "role": "admin"})
+    db["clients"].insert_many([
+        {"nome": f"Cliente {i}", "empresa": "F5TCI", "pais": "Portugal", "distancia_km": 10.0 * i}
+        for i in range(200)
+    ])
+    db["contracts"].insert_many([
+        {
+            "contrato": f"CT-{i:04d}", "estado": "Ativo", "empresa": "F5TCI",
+            "cliente": f"Cliente {i % 200}", "data_inicio": "2025-01-01", "data_fim": "2025-12-31",
+            "valor_euro": 10000.0,
+        }
+        for i in range(400)
+    ])
+
+    formatos = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")
+    tarefas = []
+    for i in range(n_tarefas):
+        dia, mes = rnd.randint(1, 28), rnd.randint(1, 12)
+        fmt = rnd.choice(formatos)
+        data = time.strftime(fmt, (2025, mes, dia, 0, 0, 0, 0, 1, -1))
+        tarefas.append({
+            "descricao": f"Tarefa {i}",
+            "cliente": "Cliente 1" if i % 4 == 0 else f"Cliente {rnd.randint(0, 199)}",
+            "contrato": "CT-0001" if i % 4 == 0 else f"CT-{rnd.randint(0, 399):04d}",
+            "atividade": rnd.choice(["Suporte", "Formação", "Consultoria"]),
+            "data": data,
+            "tempo_atividade": f"{rnd.randint(0, 8):02d}:{rnd.choice([0, 15, 30, 45]):02d}",
+            "tempo_faturado": f"{rnd.randint(0, 8):02d}:{rnd.choice([0, 15, 30, 45]):02d}",
+            "faturavel": rnd.choice(["Yes", "No"]),
+            "username": "bench" if i % 10 == 0 else f"user{rnd.randint(0, 50)}",
+        })
+    db["tasks"].insert_many(tarefas)
+
+
+def pedido_com_token(token: str):
+    from starlette.requests import Request
+
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+
+# --- Casos de benchmark ---
+# Cada caso é (nome, função sem argumentos, número de chamadas por ronda).
+def construir_casos():
+    import db as db_module
+    from fastapi.testclient import TestClient
+    from main import app
+    from routes import auth, tasks, projects, presets, users
+    import conversoes
+
+    popular_dados(db_module.db)
+
+    token = auth.create_access_token({"sub": "bench", "role": "admin"})
+    pedido = pedido_com_token(token)
+
+    parametros = {
+        "descricao": None, "cliente": "Cliente 1", "parceiro": None, "produto": None,
+        "contrato": "CT-0001", "atividade": "Suporte", "data": None, "distancia_viagem": 12.5,
+        "tempo_viagem": None, "tempo_atividade": None, "tempo_faturado": None,
+        "faturavel": "Yes", "viagem_faturavel": None, "local": None, "valor_euro": None,
+    }
+    datas = ["2025-03-14", "14/03/2025", "2025/03/14", "", "14-03-2025"] * 20
+    tempos = ["01:30", "00:45", "12:00", "invalido", "7:05"] * 20
+
+    http = TestClient(app)
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+
+    return [
+        ("tasks.construir_filtro", lambda: tasks.construir_filtro(parametros, {"username": "bench"}), 2000),
+        ("conversoes.parse_data x100", lambda: [conversoes.parse_data(d) for d in datas], 50),
+        ("projects.time_to_hours x100", lambda: [projects.time_to_hours(t) for t in tempos], 200),
+        ("projects.calcular_horas_gastas", lambda: projects.calcular_horas_gastas("Cliente 1", "CT-0001"), 5),
+        ("tasks.get_current_user_full", lambda: tasks.get_current_user_full(pedido), 500),
+        ("tasks.get_current_user", lambda: tasks.get_current_user(pedido), 500),
+        ("projects.get_current_user", lambda: projects.get_current_user(pedido), 500),
+        ("presets.get_current_username", lambda: presets.get_current_username(pedido), 500),
+        ("users.get_current_user", lambda: users.get_current_user(pedido), 500),
+        ("auth.get_current_user", lambda: auth.get_current_user(pedido), 200),
+        ("GET /clients/", lambda: http.get("/clients/", headers=cabecalhos), 10),
+        ("GET /contracts/", lambda: http.get("/contracts/", headers=cabecalhos), 10),
+        ("GET /tasks", lambda: http.get("/tasks", headers=cabecalhos), 10),
+        ("GET /tasks/all", lambda: http.get("/tasks/all", headers=cabecalhos), 3),
+        ("GET /tasks/atividade", lambda: http.get("/tasks/atividade?mes=3", headers=cabecalhos), 3),
+    ]
+
+
+# --- Medição ---
+# Devolve o melhor tempo por chamada (µs) entre várias rondas.
+def medir(fn, numero: int, rondas: int) -> float:
+    fn()  # aquecimento
+    melhor = float("inf")
+
+    for _ in range(rondas):
+        inicio = time.perf_counter()
+        for _ in range(numero):
+            fn()
+        melhor = min(melhor, (time.perf_counter() - inicio) / numero)
+
+    return melhor * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks F5TCI")
+    parser.add_argument("--mongo-url", help="Usa um mongod real em vez do mongomock.")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--filter", help="Corre apenas casos cujo nome contém este texto.")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    preparar_ambiente("f5diarios_bench", args.mongo_url)
+    if args.mongo_url:
+        import db as db_module
+        db_module.get_client().drop_database("f5diarios_bench")
+
+    casos = construir_casos()
+    if args.filter:
+        casos = [c for c in casos if args.filter in c[0]]
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    resultados = {}
+    regressoes = []
+
+    print(f"{'caso':<36}{'µs/op':>12}{'baseline':>12}{'ratio':>8}")
+    for nome, fn, numero in casos:
+        us = medir(fn, numero, args.rounds)
+        resultados[nome] = round(us, 2)
+
+        ref = baseline.get(nome)
+        ratio = us / ref if ref else None
+        marca = ""
+        if ratio and ratio > args.threshold:
+            regressoes.append(nome)
+            marca = "  ⚠️ regressão"
+
+        print(f"{nome:<36}{us:>12.2f}{(ref or 0):>12.2f}{(ratio or 0):>8.2f}{marca}")
+
+    if args.save_baseline:
+        baseline.update(resultados)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        print(f"✅ Baseline gravada em {BASELINE_PATH}")
+        return 0
+
+    if regressoes:
+        print(f"❌ {len(regressoes)} caso(s) acima de {args.threshold}x a baseline: {', '.join(regressoes)}")
+        return 1
+
+    print("✅ Sem regressões.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
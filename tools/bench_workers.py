@@ -0,0 +1,130 @@
+"""
+Escalabilidade do throughput por número de workers (serve.py).
+
+Para cada valor de --workers arranca "python serve.py" com WEB_CONCURRENCY=N,
+corre o teste de carga (tools.loadtest, modo --url) com a mesma concorrência
+e no fim mostra req/s totais, ganho face a 1 worker e req/s por worker.
+
+Precisa de um mongod partilhado pelos workers (o mongomock vive num só processo):
+
+    python -m tools.seed --mongo-url mongodb://localhost:27017 --db-name f5diarios_load --drop
+    MONGODB_URL=mongodb://localhost:27017 DB_NAME=f5diarios_load \\
+        python -m tools.bench_workers --workers 1,2,4 --concurrency 32 --duration 20
+
+Sem mongod, --mongomock arranca tools.app_local (cada worker com o seu Mongo em memória,
+com o mesmo seed). Mede só a escalabilidade da camada da API, sem contenção no Mongo:
+
+    python -m tools.bench_workers --mongomock --workers 1,2,4 --save
+
+--save grava os resultados em tools/bench_workers_results.json.
+Com poucos CPUs o ganho satura em ~CPUs workers; acima disso só aumenta a latência.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from tools.loadtest import executar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS_PATH = os.path.join(os.path.dirname(__file__), "bench_workers_results.json")
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar_servidor(url: str, processo, limite_s: float = 60):
+    fim = time.monotonic() + limite_s
+    while time.monotonic() < fim:
+        if processo.poll() is not None:
+            raise SystemExit(f"❌ O servidor terminou com código {processo.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit("❌ O servidor não respondeu a tempo.")
+
+
+def medir_workers(workers: int, args) -> tuple:
+    porta = porta_livre()
+    url = f"http://127.0.0.1:{porta}"
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(porta)}
+
+    if args.mongomock:
+        comando = [sys.executable, "-m", "uvicorn", "tools.app_local:app",
+                   "--workers", str(workers), "--port", str(porta), "--log-level", "warning"]
+    else:
+        comando = [sys.executable, "serve.py"]
+
+    processo = subprocess.Popen(
+        comando, cwd=RAIZ, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        esperar_servidor(url + "/", processo, limite_s=180)
+        opcoes = SimpleNamespace(url=url, concurrency=[args.concurrency],
+                                 duration=args.duration, seed=args.seed)
+        with open(os.devnull, "w") as nulo:
+            (_, total, erros, decorrido), = asyncio.run(executar(opcoes, nulo))
+        return total / decorrido, erros
+    finally:
+        processo.terminate()
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            processo.wait(timeout=15)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalabilidade por worker F5TCI")
+    parser.add_argument("--workers", default="1,2,4", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=30)
+    parser.add_argument("--mongomock", action="store_true",
+                        help="Cada worker usa um Mongo em memória (tools.app_local).")
+    parser.add_argument("--save", action="store_true", help=f"Grava os resultados em {RESULTADOS_PATH}.")
+    args = parser.parse_args()
+
+    if args.mongomock:
+        # Garante SECRET_KEY/API_KEY iguais no servidor e nos pedidos do teste de carga.
+        os.environ.setdefault("SECRET_KEY", "f5diarios-local-secret")
+        os.environ.setdefault("API_KEY", "f5diarios-local-api-key")
+
+    print(f"{'workers':>8}{'req/s':>10}{'ganho':>8}{'req/s/worker':>14}{'erros':>8}")
+    base = None
+    linhas = []
+    for n in args.workers:
+        rps, erros = medir_workers(n, args)
+        base = base or rps
+        print(f"{n:>8}{rps:>10.1f}{rps / base:>8.2f}{rps / n:>14.1f}{erros:>8}")
+        linhas.append({"workers": n, "req_s": round(rps, 1), "ganho": round(rps / base, 2), "erros": erros})
+
+    if args.save:
+        from config import cpus_disponiveis
+
+        with open(RESULTADOS_PATH, "w") as f:
+            json.dump({
+                "modo": "mongomock" if args.mongomock else "mongod",
+                "cpus": cpus_disponiveis(),
+                "concorrencia": args.concurrency,
+                "duracao_s": args.duration,
+                "data": time.strftime("%Y-%m-%d"),
+                "resultados": linhas,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"💾 Resultados gravados em {RESULTADOS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
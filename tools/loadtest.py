@@ -0,0 +1,191 @@
+"""
+Teste de carga ponta-a-ponta com a mistura real de tráfego da API.
+
+Simula utilizadores do website (JWT) a consultar /tasks, /presets e catálogos,
+PowerApps/Copilot a criar tarefas com x-api-key e administradores a pedir
+/tasks/all e /tasks/atividade. Para cada nível de concorrência reporta
+p50/p95/p99 por endpoint e o throughput total.
+
+    python -m tools.loadtest                          # em processo, Mongo em memória
+    python -m tools.loadtest --concurrency 1,8,32 --duration 15
+    python -m tools.loadtest --mongo-url mongodb://localhost:27017 --scale 1
+    python -m tools.loadtest --url http://localhost:8080   # servidor já a correr
+
+No modo --url o SECRET_KEY e o API_KEY são lidos do ambiente (.env),
+e têm de coincidir com os do servidor.
+"""
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from tools.mongo_local import preparar_ambiente
+
+
+# --- Mistura de tráfego ---
+# (peso, etiqueta, perfil, método, caminho)
+MISTURA = [
+    (30, "GET /tasks", "user", "GET", "/tasks"),
+    (10, "GET /presets/", "user", "GET", "/presets/"),
+    (8, "GET /clients/", "user", "GET", "/clients/"),
+    (6, "GET /contracts/", "user", "GET", "/contracts/"),
+    (4, "GET /products/", "user", "GET", "/products/"),
+    (4, "GET /activities/", "user", "GET", "/activities/"),
+    (3, "GET /partners/", "user", "GET", "/partners/"),
+    (30, "POST /tasks", "apikey", "POST", "/tasks"),
+    (2, "GET /tasks/all", "admin", "GET", "/tasks/all"),
+    (3, "GET /tasks/atividade", "admin", "GET", "/tasks/atividade"),
+]
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class Cenario:
+    def __init__(self, usernames: list, admins: list, emails: list, seed: int):
+        from routes.auth import create_access_token
+
+        self.rnd = random.Random(seed)
+        self.api_key = os.getenv("API_KEY")
+        self.tokens_user = [create_access_token({"sub": u, "role": "user"}) for u in usernames]
+        self.tokens_admin = [create_access_token({"sub": u, "role": "admin"}) for u in admins]
+        self.emails = emails
+        self.pesos = [m[0] for m in MISTURA]
+
+    # Escolhe o próximo pedido de acordo com os pesos da mistura.
+    def proximo_pedido(self):
+        _, etiqueta, perfil, metodo, caminho = self.rnd.choices(MISTURA, weights=self.pesos)[0]
+        headers = {}
+        params = None
+        corpo = None
+
+        if perfil == "user":
+            headers["Authorization"] = f"Bearer {self.rnd.choice(self.tokens_user)}"
+        elif perfil == "admin":
+            headers["Authorization"] = f"Bearer {self.rnd.choice(self.tokens_admin)}"
+            if caminho == "/tasks/atividade":
+                params = {"mes": self.rnd.randint(1, 12)}
+        else:
+            headers["x-api-key"] = self.api_key
+            headers["x-user-email"] = self.rnd.choice(self.emails)
+            corpo = {
+                "descricao": "Registo via Copilot",
+                "cliente": "Cliente 00001",
+                "contrato": "CT-000001",
+                "atividade": "Suporte",
+                "data": time.strftime("%Y-%m-%d"),
+                "tempo_atividade": "01:30",
+                "tempo_faturado": "01:30",
+            }
+
+        return etiqueta, metodo, caminho, headers, params, corpo
+
+
+# --- Execução de um nível de concorrência ---
+async def correr_nivel(cliente_http, cenario: Cenario, concorrencia: int, duracao: float):
+    latencias = defaultdict(list)
+    erros = defaultdict(int)
+    fim = time.perf_counter() + duracao
+
+    async def trabalhador():
+        while time.perf_counter() < fim:
+            etiqueta, metodo, caminho, headers, params, corpo = cenario.proximo_pedido()
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente_http.request(
+                    metodo, caminho, headers=headers, params=params, json=corpo
+                )
+                if resposta.status_code >= 400:
+                    erros[etiqueta] += 1
+            except Exception:
+                erros[etiqueta] += 1
+            latencias[etiqueta].append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+
+    return latencias, erros, decorrido
+
+
+def relatorio(saida, concorrencia: int, latencias: dict, erros: dict, decorrido: float):
+    total = sum(len(v) for v in latencias.values())
+    print(f"\n=== Concorrência {concorrencia}: {total} pedidos em {decorrido:.1f}s "
+          f"→ {total / decorrido:.1f} req/s ===", file=saida)
+    print(f"{'endpoint':<24}{'n':>7}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}", file=saida)
+
+    for etiqueta in sorted(latencias):
+        v = latencias[etiqueta]
+        print(f"{etiqueta:<24}{len(v):>7}{erros.get(etiqueta, 0):>7}"
+              f"{percentil(v, 50):>10.1f}{percentil(v, 95):>10.1f}{percentil(v, 99):>10.1f}", file=saida)
+
+
+async def executar(args, saida):
+    import httpx
+
+    if args.url:
+        usernames = [f"user{i}" for i in range(10)]
+        admins = ["user0"]
+        emails = ["loadtest@f5tci.com"]
+        transporte = None
+        base_url = args.url
+    else:
+        from db import db
+        from main import app
+        from tools.seed import popular
+
+        popular(db, args.scale, seed=args.seed, drop=True, verbose=False)
+        utilizadores = list(db["users"].find({}, {"username": 1, "email": 1, "role": 1}))
+        usernames = [u["username"] for u in utilizadores]
+        admins = [u["username"] for u in utilizadores if u.get("role") == "admin"]
+        emails = [u["email"] for u in utilizadores]
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+
+    cenario = Cenario(usernames, admins, emails, args.seed)
+    resultados = []
+
+    async with httpx.AsyncClient(transport=transporte, base_url=base_url, timeout=60) as cliente_http:
+        for concorrencia in args.concurrency:
+            latencias, erros, decorrido = await correr_nivel(
+                cliente_http, cenario, concorrencia, args.duration
+            )
+            relatorio(saida, concorrencia, latencias, erros, decorrido)
+
+            total = sum(len(v) for v in latencias.values())
+            resultados.append((concorrencia, total, sum(erros.values()), decorrido))
+
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga F5TCI")
+    parser.add_argument("--url", help="URL de um servidor já a correr (sem seed local).")
+    parser.add_argument("--mongo-url", help="Usa um mongod real em vez do mongomock.")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por nível.")
+    parser.add_argument("--scale", type=float, default=0.05, help="Escala do seed (ver tools.seed).")
+    parser.add_argument("--seed", type=int, default=28)
+    args = parser.parse_args()
+
+    if not args.url:
+        preparar_ambiente("f5diarios_loadtest", args.mongo_url)
+
+    # Os handlers escrevem logs de depuração no stdout; o relatório vai para o stdout original.
+    saida = sys.stdout
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        asyncio.run(executar(args, saida))
+
+
+if __name__ == "__main__":
+    main()
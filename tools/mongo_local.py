@@ -0,0 +1,47 @@
+import os
+
+# --- Ambiente local para ferramentas (benchmarks, carga, seed) ---
+# Tem de ser chamado ANTES de importar config/db/routes.
+# Por omissão substitui o MongoClient pelo mongomock (tudo em memória, sem rede).
+# Com mongo_url definido usa um mongod real (ex.: mongodb://localhost:27017).
+def preparar_ambiente(db_name: str, mongo_url: str = None):
+    os.environ["MONGODB_URL"] = mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = db_name
+    os.environ.setdefault("SECRET_KEY", "f5diarios-local-secret")
+    os.environ.setdefault("API_KEY", "f5diarios-local-api-key")
+
+    if mongo_url:
+        return
+
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit(
+            "❌ mongomock não está instalado. Instala com 'pip install -r requirements-dev.txt' "
+            "ou usa --mongo-url para um mongod local."
+        )
+
+    # O mongomock não tem coleções capped nem cursores tailable (barramento "mongo").
+    os.environ.setdefault("EVENT_BUS", "local")
+
+    import pymongo
+    pymongo.MongoClient = mongomock.MongoClient
+    compatibilizar_bulk(mongomock)
+
+
+# O pymongo >= 4.11 passa "sort" a UpdateOne/ReplaceOne dentro de bulk_write,
+# argumento que o mongomock 4.x ainda não conhece (e que a API não usa).
+def compatibilizar_bulk(mongomock):
+    builder = mongomock.collection.BulkOperationBuilder
+
+    for nome in ("add_update", "add_replace"):
+        original = getattr(builder, nome)
+        if getattr(original, "_sem_sort", False):
+            continue
+
+        def sem_sort(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+
+        sem_sort._sem_sort = True
+        setattr(builder, nome, sem_sort)
+
@@ -0,0 +1,38 @@
+"""
+Reconstrói o rollup diário de horas (coleção tasks_daily_rollup) a partir das tarefas.
+
+    python -m tools.rebuild_rollup                       # tudo
+    python -m tools.rebuild_rollup --cliente "Cliente X" --contrato CT-001
+    python -m tools.rebuild_rollup --username joao
+
+Usa a base definida em MONGODB_URL / DB_NAME (.env).
+"""
+import argparse
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrução do rollup diário F5TCI")
+    parser.add_argument("--cliente")
+    parser.add_argument("--contrato")
+    parser.add_argument("--username")
+    parser.add_argument("--atividade")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    import rollup
+
+    filtro = {
+        campo: getattr(args, campo)
+        for campo in ("cliente", "contrato", "username", "atividade")
+        if getattr(args, campo) is not None
+    }
+
+    inicio = time.perf_counter()
+    rollup.criar_indices()
+    linhas = rollup.reconstruir(filtro, args.batch_size)
+    print(f"✅ Rollup reconstruído: {linhas} linhas em {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Gerador de dados sintéticos para testes de carga e dimensionamento do Mongo.
+
+Popula as nove coleções de db.py com volumes proporcionais a --scale
+(1x ≈ volume atual de produção) e distribuição enviesada (zipf) de tarefas
+por utilizador e por cliente. O resultado é determinístico para a mesma --seed.
+
+    python -m tools.seed --scale 10 --db-name f5diarios_load --drop
+    python -m tools.seed --scale 100 --skew 1.2 --batch-size 5000 --db-name f5diarios_load
+    python -m tools.seed --mongo-url mongodb://localhost:27017 --db-name f5diarios_load
+
+Sem --mongo-url / --db-name escreve na base definida em MONGODB_URL / DB_NAME (.env).
+--drop exige --db-name e recusa apagar a base configurada no .env (pode ser produção).
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from passlib.context import CryptContext
+
+# Volume por coleção para --scale 1.
+VOLUME_BASE = {
+    "users": 40,
+    "clients": 250,
+    "contracts": 500,
+    "products": 40,
+    "partners": 80,
+    "activities": 12,
+    "projects": 150,
+    "presets": 120,
+    "tasks": 40000,
+}
+
+ATIVIDADES = [
+    "Suporte", "Formação", "Consultoria", "Implementação", "Desenvolvimento", "Reunião",
+    "Análise", "Manutenção", "Deslocação", "Auditoria", "Gestão de Projeto", "Pré-venda",
+]
+PAISES = ["Portugal", "Espanha", "França", "Angola", "Moçambique", "Brasil"]
+LOCALIDADES = ["Lisboa", "Porto", "Braga", "Coimbra", "Faro", "Aveiro", "Madrid", "Luanda"]
+FORMATOS_DATA = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")
+
+
+def volumes(escala: float) -> dict:
+    return {nome: max(1, int(n * escala)) for nome, n in VOLUME_BASE.items()}
+
+
+# --- Distribuição enviesada ---
+# Pesos cumulativos zipf (1/rank^skew) para random.choices, calculados uma vez.
+def pesos_zipf(n: int, skew: float) -> list:
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def duracao(rnd: random.Random, max_horas: int = 8) -> str:
+    return f"{rnd.randint(0, max_horas):02d}:{rnd.choice((0, 15, 30, 45)):02d}"
+
+
+# --- Geradores por coleção ---
+
+def gerar_users(rnd, n, password_hash):
+    for i in range(n):
+        yield {
+            "nome": f"Utilizador {i}",
+            "username": f"user{i}",
+            "email": f"user{i}@f5tci.com",
+            "empresa_base": rnd.choice(["F5TCI", "F5IT"]),
+            "role": "admin" if i < max(1, n // 20) else "user",
+            "password": password_hash,
+        }
+
+
+def gerar_clients(rnd, n):
+    for i in range(n):
+        yield {
+            "nome": f"Cliente {i:05d}",
+            "empresa": rnd.choice(["F5TCI", "F5IT"]),
+            "pais": rnd.choice(PAISES),
+            "distancia_km": round(rnd.uniform(0, 400), 1),
+            "tempo_viagem": duracao(rnd, 4),
+            "latitude": round(rnd.uniform(37.0, 42.0), 6),
+            "longitude": round(rnd.uniform(-9.5, -6.2), 6),
+            "localidade": rnd.choice(LOCALIDADES),
+        }
+
+
+def gerar_contracts(rnd, n, n_clients):
+    for i in range(n):
+        inicio = date(2023, 1, 1) + timedelta(days=rnd.randint(0, 900))
+        yield {
+            "contrato": f"CT-{i:06d}",
+            "estado": rnd.choice(["Ativo", "Ativo", "Ativo", "Fechado"]),
+            "empresa": rnd.choice(["F5TCI", "F5IT"]),
+            "cliente": f"Cliente {i % n_clients:05d}",
+            "p_manager": f"user{rnd.randint(0, 9)}",
+            "comercial": f"user{rnd.randint(0, 9)}",
+            "data_inicio": inicio.isoformat(),
+            "data_fim": (inicio + timedelta(days=365)).isoformat(),
+            "valor_d": float(rnd.randint(5, 200)),
+            "valor_euro": float(rnd.randint(5, 200) * 600),
+        }
+
+
+def gerar_products(rnd, n):
+    for i in range(n):
+        yield {"produto": f"Produto {i:03d}", "empresa": rnd.choice(["F5TCI", "F5IT"])}
+
+
+def gerar_partners(rnd, n):
+    for i in range(n):
+        # ParceiroBase guarda coordenadas como texto.
+        yield {
+            "parceiro": f"Parceiro {i:04d}",
+            "empresa": rnd.choice(["F5TCI", "F5IT"]),
+            "pais": rnd.choice(PAISES),
+            "localidade": rnd.choice(LOCALIDADES),
+            "latitude": f"{rnd.uniform(37.0, 42.0):.6f}",
+            "longitude": f"{rnd.uniform(-9.5, -6.2):.6f}",
+        }
+
+
+def gerar_activities(rnd, n):
+    for i in range(n):
+        nome = ATIVIDADES[i] if i < len(ATIVIDADES) else f"Atividade {i}"
+        yield {"atividade": nome, "custo_hora": float(rnd.choice((35, 45, 55, 65, 80)))}
+
+
+def gerar_tarefa(rnd, ctx, username=None):
+    contrato = rnd.choices(ctx["contracts"], cum_weights=ctx["pesos_contracts"])[0]
+    dia = ctx["inicio"] + timedelta(days=rnd.randint(0, ctx["dias"]))
+    km = rnd.choice((0, 0, 0, rnd.randint(5, 300)))
+
+    return {
+        "descricao": f"Intervenção {rnd.randint(1, 10 ** 6)}",
+        "cliente": contrato["cliente"],
+        "parceiro": rnd.choice(ctx["partners"]) if rnd.random() < 0.3 else None,
+        "produto": rnd.choice(ctx["products"]),
+        "contrato": contrato["contrato"],
+        "atividade": rnd.choice(ctx["activities"]),
+        "data": dia.strftime(rnd.choice(FORMATOS_DATA)),
+        # Os schemas aceitam texto ou número nestes campos.
+        "distancia_viagem": str(km) if rnd.random() < 0.5 else float(km),
+        "tempo_viagem": duracao(rnd, 3) if km else "00:00",
+        "tempo_atividade": duracao(rnd),
+        "tempo_faturado": duracao(rnd),
+        "faturavel": rnd.choice(("Yes", "No")),
+        "viagem_faturavel": rnd.choice(("Yes", "No")),
+        "local": rnd.choice(("Employee House", "Cliente", "Escritório")),
+        "valor_euro": rnd.choice((0, "0", float(rnd.randint(0, 500)))),
+        "username": username or rnd.choices(ctx["users"], cum_weights=ctx["pesos_users"])[0],
+    }
+
+
+def gerar_tasks(rnd, n, ctx):
+    for _ in range(n):
+        yield gerar_tarefa(rnd, ctx)
+
+
+def gerar_projects(rnd, n, contracts):
+    for c in rnd.sample(contracts, min(n, len(contracts))):
+        yield {
+            "cliente": c["cliente"],
+            "contrato": c["contrato"],
+            "descricao": f"Projeto {c['contrato']}",
+            "horas_contratadas": float(rnd.randint(20, 800)),
+            "horas_gastas": 0.0,
+        }
+
+
+def gerar_presets(rnd, n, ctx):
+    for i in range(n):
+        base = gerar_tarefa(rnd, ctx)
+        base.pop("data", None)
+        yield {**base, "nome": f"Preset {i}", "ativo": rnd.random() < 0.5}
+
+
+# --- Escrita em lotes ---
+def inserir_em_lotes(collection, documentos, tamanho_lote: int) -> int:
+    total = 0
+    lote = []
+
+    for doc in documentos:
+        lote.append(doc)
+        if len(lote) >= tamanho_lote:
+            collection.insert_many(lote, ordered=False)
+            total += len(lote)
+            lote = []
+
+    if lote:
+        collection.insert_many(lote, ordered=False)
+        total += len(lote)
+
+    return total
+
+
+# --- Geração completa ---
+# Devolve o número de documentos escritos por coleção.
+def popular(db, escala: float = 1.0, seed: int = 27, skew: float = 1.1,
+            tamanho_lote: int = 2000, drop: bool = False, verbose: bool = True) -> dict:
+    rnd = random.Random(seed)
+    n = volumes(escala)
+
+    if drop:
+        for nome in VOLUME_BASE:
+            db[nome].drop()
+
+    # Todos os utilizadores ficam com a password "password" (um só hash bcrypt).
+    password_hash = CryptContext(schemes=["bcrypt"], deprecated="auto").hash("password")
+
+    # Catálogos pequenos ficam em memória para referenciar nas tarefas.
+    users = list(gerar_users(rnd, n["users"], password_hash))
+    clients = list(gerar_clients(rnd, n["clients"]))
+    contracts = list(gerar_contracts(rnd, n["contracts"], n["clients"]))
+    products = list(gerar_products(rnd, n["products"]))
+    partners = list(gerar_partners(rnd, n["partners"]))
+    activities = list(gerar_activities(rnd, n["activities"]))
+
+    ctx = {
+        "users": [u["username"] for u in users],
+        "pesos_users": pesos_zipf(len(users), skew),
+        "contracts": contracts,
+        "pesos_contracts": pesos_zipf(len(contracts), skew),
+        "products": [p["produto"] for p in products],
+        "partners": [p["parceiro"] for p in partners],
+        "activities": [a["atividade"] for a in activities],
+        "inicio": date(2024, 1, 1),
+        "dias": 730,
+    }
+
+    fontes = [
+        ("users", users),
+        ("clients", clients),
+        ("contracts", contracts),
+        ("products", products),
+        ("partners", partners),
+        ("activities", activities),
+        ("projects", gerar_projects(rnd, n["projects"], contracts)),
+        ("presets", gerar_presets(rnd, n["presets"], ctx)),
+        ("tasks", gerar_tasks(rnd, n["tasks"], ctx)),
+    ]
+
+    escritos = {}
+    for nome, docs in fontes:
+        inicio = time.perf_counter()
+        # insert_many acrescenta _id aos dicts; copia os catálogos reutilizados.
+        docs = (dict(d) for d in docs)
+        escritos[nome] = inserir_em_lotes(db[nome], docs, tamanho_lote)
+        if verbose:
+            duracao_s = time.perf_counter() - inicio
+            print(f"✅ {nome:<12}{escritos[nome]:>10} docs em {duracao_s:6.2f}s")
+
+    return escritos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de dados sintéticos F5TCI")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador de volume (1, 10, 100...).")
+    parser.add_argument("--seed", type=int, default=27)
+    parser.add_argument("--skew", type=float, default=1.1, help="Expoente zipf (0 = uniforme).")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--drop", action="store_true", help="Apaga as coleções antes de escrever.")
+    parser.add_argument("--mongo-url")
+    parser.add_argument("--db-name")
+    args = parser.parse_args()
+
+    if args.drop:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        if not args.db_name:
+            parser.error("--drop exige --db-name explícito (ex.: --db-name f5diarios_load).")
+        mesma_ligacao = not args.mongo_url or args.mongo_url == os.getenv("MONGODB_URL")
+        if mesma_ligacao and args.db_name == os.getenv("DB_NAME"):
+            parser.error(f"--drop recusado: {args.db_name} é a base configurada em DB_NAME (.env).")
+
+    if args.mongo_url:
+        os.environ["MONGODB_URL"] = args.mongo_url
+    if args.db_name:
+        os.environ["DB_NAME"] = args.db_name
+
+    from db import db
+
+    print(f"📦 A gerar dados para {db.name} (escala {args.scale}x, seed {args.seed})")
+    escritos = popular(db, args.scale, args.seed, args.skew, args.batch_size, args.drop)
+    print(f"✅ Total: {sum(escritos.values())} documentos")
+
+
+if __name__ == "__main__":
+    main()